@@ -0,0 +1,49 @@
+"""case-insensitive covering email index
+
+Revision ID: 7c41e9a5b3d2
+Revises: d2bea20d0760
+Create Date: 2026-10-18 12:00:00.000000
+
+Заменяет uq_users_email уникальным индексом по lower(email) с колонками
+состояния пользователя в INCLUDE. Индекс строится CONCURRENTLY, поэтому
+миграция не блокирует запись в users. Если в таблице уже есть адреса,
+отличающиеся только регистром, построение упадет: такие дубликаты нужно
+разобрать вручную до запуска.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7c41e9a5b3d2"
+down_revision: Union[str, None] = "d2bea20d0760"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_email_lower",
+            "users",
+            [sa.text("lower(email)")],
+            unique=True,
+            postgresql_include=["id", "email", "role", "is_active", "is_verified"],
+            postgresql_concurrently=True,
+        )
+    op.drop_constraint(op.f("uq_users_email"), "users", type_="unique")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_unique_constraint(op.f("uq_users_email"), "users", ["email"])
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_email_lower",
+            table_name="users",
+            postgresql_concurrently=True,
+        )
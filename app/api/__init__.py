@@ -1,5 +1,8 @@
 from fastapi import APIRouter, Depends
 from app.api.routes.auth import router as auth_router
+from app.api.routes.introspection import router as introspection_router
+from app.api.routes.users import router as users_router
+from app.core.config import settings
 from fastapi.security import HTTPBearer
 
 http_bearer = HTTPBearer(auto_error=False)
@@ -11,3 +14,10 @@ api_router = APIRouter(
     dependencies=[Depends(http_bearer)],
 )
 api_router.include_router(auth_router)
+api_router.include_router(users_router)
+api_router.include_router(introspection_router)
+
+if settings.debug.profiler_token:
+    from app.api.routes.debug import router as debug_router
+
+    api_router.include_router(debug_router)
@@ -1,20 +1,25 @@
+import hmac
 from typing import TYPE_CHECKING, Annotated
 
-from fastapi import Body, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Body, Depends, HTTPException, Request, status
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, OAuth2PasswordBearer
 from jwt import InvalidTokenError
 
+from app.core.config import settings
 from app.core.security import (
     TokenTypes,
     PAYLOAD_KEY_SUB,
     PAYLOAD_KEY_TOKEN_TYPE,
     decode_jwt,
 )
-from app.database import crud
+from app.core.token_cache import token_cache
+from app.database.blacklist import is_revoked
 from app.database.db import db_helper
 from app.database.redis_db import redis_helper
-from app.models.user import User
-from app.schemas import RefreshToken
+from app.database.token_epochs import token_epochs
+from app.database.user_cache import user_state_cache
+from app.models.user import UserRole
+from app.schemas import RefreshToken, UserState
 
 if TYPE_CHECKING:
     from redis.asyncio import Redis
@@ -22,18 +27,29 @@ if TYPE_CHECKING:
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+client_basic = HTTPBasic(auto_error=False)
 
 
 SessionDep = Annotated["AsyncSession", Depends(db_helper.get_session)]
+# Чтения, которым допустимо отставание реплики, см. get_read_session
+ReadSessionDep = Annotated["AsyncSession", Depends(db_helper.get_read_session)]
 RedisDep = Annotated["Redis", Depends(redis_helper.get_client)]
 TokenDep = Annotated[str, Depends(oauth2_scheme)]
 
 
-async def decode_jwt_or_403(token: str, redis: "Redis") -> dict:
+async def decode_jwt_or_403(
+    token: str,
+    redis: "Redis",
+    check_revoked: bool = True,
+) -> dict:
     try:
-        payload = decode_jwt(token=token)
-        jti = payload["jti"]
-        if (await redis.get(("blacklist:%s" % jti))) is not None:
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = decode_jwt(token=token)
+            token_cache.put(token, payload)
+        if check_revoked and await is_revoked(redis, payload["jti"], payload["exp"]):
+            raise InvalidTokenError
+        if await token_epochs.is_outdated(redis, payload):
             raise InvalidTokenError
     except InvalidTokenError:
         raise HTTPException(
@@ -57,21 +73,29 @@ async def get_refresh_token_payload(
     return await decode_jwt_or_403(token.refresh_token, redis)
 
 
+def get_client_ip(request: Request) -> str:
+    # X-Forwarded-For разбирает uvicorn --proxy-headers и только для прокси
+    # из FORWARDED_ALLOW_IPS; сам заголовок подделывается клиентом
+    return request.client.host if request.client else "unknown"
+
+
+ClientIP = Annotated[str, Depends(get_client_ip)]
 AccessTokenPayload = Annotated[dict, Depends(get_current_token_payload)]
 RefreshTokenPayload = Annotated[dict, Depends(get_refresh_token_payload)]
 
 
 async def get_current_user(
-    session: SessionDep,
+    session: ReadSessionDep,
+    redis: RedisDep,
     payload: AccessTokenPayload,
-) -> User:
+) -> UserState:
     if payload.get(PAYLOAD_KEY_TOKEN_TYPE) != TokenTypes.ACCESS:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token type",
         )
     email = payload[PAYLOAD_KEY_SUB]
-    user = await crud.get_user_by_email(session=session, email=email)
+    user = await user_state_cache.get(redis=redis, session=session, email=email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -83,4 +107,52 @@ async def get_current_user(
     return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUser = Annotated[UserState, Depends(get_current_user)]
+
+
+async def get_current_admin(user: CurrentUser) -> UserState:
+    if user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges",
+        )
+    return user
+
+
+CurrentAdmin = Annotated[UserState, Depends(get_current_admin)]
+
+
+async def is_admin_token(token: str) -> bool:
+    """Проверки CurrentAdmin для кода вне зависимостей FastAPI
+    (ProfilerMiddleware)."""
+    redis = redis_helper.client
+    try:
+        payload = await decode_jwt_or_403(token, redis)
+    except HTTPException:
+        return False
+    if payload.get(PAYLOAD_KEY_TOKEN_TYPE) != TokenTypes.ACCESS:
+        return False
+    async with db_helper.session_factory() as session:
+        user = await user_state_cache.get(
+            redis=redis, session=session, email=payload[PAYLOAD_KEY_SUB]
+        )
+    return user is not None and user.is_active and user.role == UserRole.admin
+
+
+def get_introspection_client(
+    credentials: Annotated[HTTPBasicCredentials | None, Depends(client_basic)],
+) -> str:
+    clients = settings.security.introspection.clients
+    secret = clients.get(credentials.username) if credentials else None
+    if secret is None or not hmac.compare_digest(
+        credentials.password.encode(), secret.encode()  # type: ignore[union-attr]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid client credentials",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials.username  # type: ignore[union-attr]
+
+
+IntrospectionClient = Annotated[str, Depends(get_introspection_client)]
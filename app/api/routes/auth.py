@@ -1,70 +1,106 @@
 import logging
+import uuid
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.api.deps import (
+    ClientIP,
     CurrentUser,
     RedisDep,
+    ReadSessionDep,
     SessionDep,
     AccessTokenPayload,
     RefreshTokenPayload,
     decode_jwt_or_403,
 )
+from app.core.admission import hashing_admission
 from app.core.config import settings
 from app.core.security import (
+    PAYLOAD_KEY_FAMILY,
     PAYLOAD_KEY_SUB,
     PAYLOAD_KEY_TOKEN_TYPE,
     TokenTypes,
     create_token_by_type,
 )
+from app.core.timing import TimedRoute
 from app.database import crud
-from app.models.user import User
-from app.schemas import Token, UserCreate, UserPublic
+from app.database.blacklist import RotationResult, revoke, rotate_refresh_token
+from app.database.rate_limit import login_throttle
+from app.database.token_epochs import token_epochs
+from app.database.user_cache import user_state_cache
+from app.schemas import RefreshToken, Token, UserCreate, UserPublic, UserState
 from app.utils.email_helpers import send_verify_token
 
 logger = logging.getLogger(__name__)
 
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=TimedRoute)
 
 
 @router.post(
     "/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED
 )
-async def create_user(session: SessionDep, user_in: UserCreate) -> User:
-    user = await crud.get_user_by_email(session=session, email=user_in.email)
-    if user:
+async def create_user(session: SessionDep, user_in: UserCreate) -> UserState:
+    async with hashing_admission.slot():
+        user = await crud.create_user(session=session, user_create=user_in)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="The user with this email already exists in the system.",
         )
-
-    user = await crud.create_user(session=session, user_create=user_in)
     logger.info("User successfully registered: %s" % user.email)
     return user
 
 
 @router.post("/login")
 async def login(
+    read_session: ReadSessionDep,
     session: SessionDep,
+    redis: RedisDep,
+    client_ip: ClientIP,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
-    user = await crud.authenticate(
-        session=session, email=form_data.username, password=form_data.password
+    attempt = uuid.uuid4().hex
+    retry_after = await login_throttle.check(
+        redis, client_ip, form_data.username, attempt
     )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+    try:
+        async with hashing_admission.slot():
+            user = await crud.authenticate(
+                session=read_session,
+                email=form_data.username,
+                password=form_data.password,
+                primary=session,
+            )
+    except Exception:
+        # пароль не проверен (перегрузка, сбой БД) - попытка не в счет
+        await login_throttle.release(redis, client_ip, form_data.username, attempt)
+        raise
     if not user:
+        await login_throttle.record_failure(redis, client_ip, form_data.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password",
         )
-    elif not user.is_active:
+    await login_throttle.record_success(redis, client_ip, form_data.username, attempt)
+    if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
-    access_token = create_token_by_type(TokenTypes.ACCESS)(user)
-    refresh_token = create_token_by_type(TokenTypes.REFRESH)(user)
+    epoch = await token_epochs.current(redis, str(user.id))
+    refresh_jti = str(uuid.uuid4())
+    access_token = create_token_by_type(TokenTypes.ACCESS)(user, epoch)
+    refresh_token = create_token_by_type(TokenTypes.REFRESH)(
+        user, epoch, jti=refresh_jti, family=refresh_jti
+    )
     return Token(
         access_token=access_token,
         refresh_token=refresh_token,
@@ -78,37 +114,34 @@ async def logout(
     redis: RedisDep,
 ):
 
-    access_jti = access_token["jti"]
     refresh_jti = refresh_token["jti"]
 
-    await redis.set(
-        name=("blacklist:%s" % access_jti),
-        value="revoked",
-        ex=settings.security.jwt.access_token_expire_minutes * 60,
-    )
-    await redis.set(
-        name=("blacklist:%s" % refresh_jti),
-        value="revoked",
-        ex=settings.security.jwt.refresh_token_expire_days * 24 * 60 * 60,
+    refresh_ttl = settings.security.jwt.refresh_token_expire_days * 24 * 60 * 60
+    await revoke(
+        redis,
+        (access_token["jti"], access_token["exp"]),
+        (refresh_jti, refresh_token["exp"]),
+        family=(refresh_token.get(PAYLOAD_KEY_FAMILY, refresh_jti), refresh_ttl),
     )
     return None
 
 
 @router.post("/refresh")
 async def refresh(
-    refresh_token: RefreshTokenPayload,
-    session: SessionDep,
+    token: RefreshToken,
+    session: ReadSessionDep,
     redis: RedisDep,
 ) -> Token:
-
-    payload = refresh_token.copy()
+    # Отзыв проверяет rotate_refresh_token: повторное предъявление
+    # замененного токена должно дойти до него и отозвать семейство
+    payload = await decode_jwt_or_403(token.refresh_token, redis, check_revoked=False)
     if payload.get(PAYLOAD_KEY_TOKEN_TYPE) != TokenTypes.REFRESH:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token type",
         )
 
-    user = await crud.get_user_by_email(
+    user = await crud.get_user_state(
         session=session,
         email=payload[PAYLOAD_KEY_SUB],
     )
@@ -119,26 +152,45 @@ async def refresh(
             detail="Invalid user",
         )
 
-    refresh_jti = refresh_token["jti"]
-    await redis.set(
-        name=("blacklist:%s" % refresh_jti),
-        value="revoked",
-        ex=settings.security.jwt.refresh_token_expire_days * 24 * 60 * 60,
+    family = payload.get(PAYLOAD_KEY_FAMILY, payload["jti"])
+    new_refresh_jti = str(uuid.uuid4())
+    result = await rotate_refresh_token(
+        redis,
+        family=family,
+        old_jti=payload["jti"],
+        old_exp=payload["exp"],
+        new_jti=new_refresh_jti,
+        ttl=settings.security.jwt.refresh_token_expire_days * 24 * 60 * 60,
+    )
+    if result != RotationResult.ROTATED:
+        if result == RotationResult.REUSED:
+            logger.warning(
+                "Refresh token reuse detected, family revoked: %s" % user.email
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+
+    epoch = await token_epochs.current(redis, str(user.id))
+    access_token = create_token_by_type(TokenTypes.ACCESS)(user, epoch)
+    refresh_token = create_token_by_type(TokenTypes.REFRESH)(
+        user, epoch, jti=new_refresh_jti, family=family
     )
-    access_token = create_token_by_type(TokenTypes.ACCESS)(user)
-    refresh_token = create_token_by_type(TokenTypes.REFRESH)(user)  # type: ignore
 
     return Token(
         access_token=access_token,
-        refresh_token=refresh_token,  # type: ignore
+        refresh_token=refresh_token,
     )
 
 
 @router.post("/request-verify-token", status_code=status.HTTP_202_ACCEPTED)
-async def request_verify_token(user: CurrentUser):
+async def request_verify_token(user: CurrentUser, redis: RedisDep):
+    epoch = await token_epochs.current(redis, str(user.id))
     await send_verify_token(
+        redis,
         to_email=user.email,
-        token=create_token_by_type(TokenTypes.VERIFY)(user),
+        token=create_token_by_type(TokenTypes.VERIFY)(user, epoch),
     )
 
 
@@ -146,19 +198,19 @@ async def request_verify_token(user: CurrentUser):
 async def verify(token: str, redis: RedisDep, session: SessionDep):
     payload = await decode_jwt_or_403(token, redis)
     email = payload[PAYLOAD_KEY_SUB]
-    user = await crud.get_user_by_email(session=session, email=email)
-    if not user:
+    result = await crud.verify_user(session, email)
+    if result == crud.VerifyResult.NOT_FOUND:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    if not user.is_active:
+    if result == crud.VerifyResult.INACTIVE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
-    if user.is_verified:
+    if result == crud.VerifyResult.ALREADY_VERIFIED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Verify user already verified",
         )
-    await crud.verify_user(session, email)
-    logger.info("User verify email: %s" % user.email)
+    await user_state_cache.invalidate(redis, email)
+    logger.info("User verify email: %s" % email)
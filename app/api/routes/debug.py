@@ -0,0 +1,39 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import CurrentAdmin
+from app.core.profiler import ProfilerBusy, profiler_manager
+from app.core.timing import TimedRoute
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/debug", tags=["debug"], route_class=TimedRoute)
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_window(
+    admin: CurrentAdmin,
+    seconds: float = Query(default=10, gt=0, le=120),
+):
+    """Профилирует воркер в течение seconds и возвращает folded stacks."""
+    logger.info("Profiling for %.1f s started by %s" % (seconds, admin.email))
+    try:
+        return await profiler_manager.capture(seconds)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profiler is already running",
+        )
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, admin: CurrentAdmin):
+    folded = profiler_manager.load(profile_id)
+    if folded is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+    return folded
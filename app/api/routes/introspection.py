@@ -0,0 +1,36 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, status
+
+from app.api.deps import IntrospectionClient, ReadSessionDep, RedisDep
+from app.core.config import settings
+from app.core.timing import TimedRoute
+from app.database.introspection import introspect_tokens
+from app.schemas import IntrospectionRequest, IntrospectionResponse
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/auth", tags=["introspection"], route_class=TimedRoute)
+
+
+@router.post(
+    "/introspect",
+    response_model=IntrospectionResponse,
+    response_model_exclude_none=True,
+)
+async def introspect(
+    request: IntrospectionRequest,
+    client: IntrospectionClient,
+    session: ReadSessionDep,
+    redis: RedisDep,
+) -> IntrospectionResponse:
+    """Проверяет пачку токенов; результаты идут в порядке запроса."""
+    if len(request.tokens) > settings.security.introspection.max_batch_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Too many tokens, the limit is %d"
+            % settings.security.introspection.max_batch_size,
+        )
+    results = await introspect_tokens(redis, session, request.tokens)
+    return IntrospectionResponse(results=results)
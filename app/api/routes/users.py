@@ -0,0 +1,50 @@
+import logging
+import uuid
+
+from fastapi import APIRouter, HTTPException, status
+
+from app.api.deps import CurrentAdmin, RedisDep, SessionDep
+from app.core.timing import TimedRoute
+from app.database import crud
+from app.database.token_epochs import token_epochs
+from app.database.user_cache import user_state_cache
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/users", tags=["users"], route_class=TimedRoute)
+
+
+@router.post("/{user_id}/deactivate", status_code=status.HTTP_204_NO_CONTENT)
+async def deactivate_user(
+    user_id: uuid.UUID,
+    admin: CurrentAdmin,
+    session: SessionDep,
+    redis: RedisDep,
+):
+    email = await crud.deactivate_user(session, user_id)
+    if email is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    await user_state_cache.invalidate(redis, email)
+    logger.info("User deactivated by %s: %s" % (admin.email, email))
+    return None
+
+
+@router.post("/{user_id}/revoke-tokens", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_user_tokens(
+    user_id: uuid.UUID,
+    admin: CurrentAdmin,
+    session: SessionDep,
+    redis: RedisDep,
+):
+    if not await crud.user_exists(session, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    epoch = await token_epochs.bump(redis, str(user_id))
+    logger.info(
+        "All tokens revoked by %s: user %s, epoch %d" % (admin.email, user_id, epoch)
+    )
+    return None
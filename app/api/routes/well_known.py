@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from app.core.config import settings
+from app.core.jwks import Document, key_publisher
+
+"""Публичные ключи и discovery для ресурсных серверов, проверяющих
+токены у себя. Отдаются без авторизации, вне префикса API."""
+
+router = APIRouter(prefix="/.well-known", tags=["well-known"])
+
+CACHE_CONTROL = "public, max-age=%d" % settings.security.jwks.max_age_seconds
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    # If-None-Match сравнивается слабо (RFC 9110, 13.1.2)
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _document_response(request: Request, document: Document) -> Response:
+    headers = {"ETag": document.etag, "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, document.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=document.body, media_type="application/json", headers=headers
+    )
+
+
+@router.get("/jwks.json")
+async def jwks(request: Request) -> Response:
+    return _document_response(request, key_publisher.jwks())
+
+
+@router.get("/openid-configuration")
+async def openid_configuration(request: Request) -> Response:
+    # адрес из запроса не годится: он не совпадает с iss в токенах
+    issuer = settings.security.jwks.issuer
+    if issuer is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return _document_response(request, key_publisher.discovery(issuer))
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, Iterator
+
+from pydantic import ValidationError
+
+from app.core.hashing import hash_passwords, identify
+from app.core.security import HASH_PARAMS
+from app.database.db import db_helper
+from app.models.user import User, UserRole
+from app.schemas import UserBase, UserCreate
+
+"""Массовый импорт пользователей из CSV или NDJSON.
+
+    python -m app.bulk_import users.csv --duplicates dup.txt --rejected bad.txt
+
+Ожидаемые поля: email, password (открытый пароль или готовый хеш bcrypt
+либо argon2id, который сохраняется как есть), необязательные role,
+is_active, is_verified. Вход читается потоково и обрабатывается пачками:
+пока одна пачка хешируется в пуле процессов, предыдущая загружается
+через COPY во временную таблицу и переносится в users с ON CONFLICT DO
+NOTHING, так что в памяти одновременно не больше двух пачек. Строки,
+которые не принял бы /register, пропускаются; их номера и причины пишутся
+в --rejected, как пропущенные дубликаты в --duplicates.
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "email", "password", "role", "is_active", "is_verified")
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+EMAIL_MAX_LENGTH = User.__table__.c.email.type.length
+
+_CREATE_STAGING = (
+    "CREATE TEMP TABLE users_import (LIKE users INCLUDING DEFAULTS) "
+    "ON COMMIT DELETE ROWS"
+)
+_MOVE_STAGING = (
+    "INSERT INTO users (%(columns)s) SELECT %(columns)s FROM users_import "
+    "ON CONFLICT DO NOTHING RETURNING id" % {"columns": ", ".join(COLUMNS)}
+)
+
+
+@dataclass
+class ImportStats:
+    started: float = field(default_factory=time.perf_counter)
+    processed: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+
+    def __str__(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return "processed %d, inserted %d, duplicates %d, invalid %d, %.0f rows/s" % (
+            self.processed,
+            self.inserted,
+            self.duplicates,
+            self.invalid,
+            self.processed / elapsed if elapsed else 0,
+        )
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[dict | None]:
+    """Строки входа; None на месте строки NDJSON, которая не разобралась."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def _flag(value, default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_row(row: dict | None) -> tuple:
+    """Приводит строку входа к (id, email, password, role, is_active,
+    is_verified); password остается строкой, если его нужно хешировать.
+
+    Email и открытый пароль проверяются той же схемой UserCreate, что и
+    в /register, и email сохраняется в нормализованном ею виде. Строка,
+    которую API не принял бы, отклоняется с ValueError и причиной.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("not an object")
+    email, password = row.get("email"), row.get("password")
+    if isinstance(email, str):
+        email = email.strip()
+    hashed = isinstance(password, str) and identify(password.encode()) is not None
+    # готовый хеш длиннее пароля, поэтому для него проверяется только email
+    schema = UserBase if hashed else UserCreate
+    try:
+        user = schema.model_validate({"email": email, "password": password})
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        raise ValueError(
+            "%s: %s" % (".".join(map(str, error["loc"])), error["msg"])
+        ) from None
+    if len(user.email) > EMAIL_MAX_LENGTH:
+        raise ValueError("email: longer than %d characters" % EMAIL_MAX_LENGTH)
+    try:
+        role = UserRole(row.get("role") or UserRole.user)
+    except ValueError:
+        raise ValueError("role: unknown role %s" % row.get("role")) from None
+    return (
+        uuid.uuid4(),
+        user.email,
+        password.encode() if hashed else password,
+        role.value,
+        _flag(row.get("is_active"), True),
+        _flag(row.get("is_verified"), False),
+    )
+
+
+class BulkImporter:
+    def __init__(
+        self,
+        pool: ProcessPoolExecutor,
+        workers: int,
+        batch_size: int,
+        duplicates: IO[str] | None,
+        rejected: IO[str] | None,
+    ) -> None:
+        self.pool = pool
+        self.workers = workers
+        self.batch_size = batch_size
+        self.duplicates = duplicates
+        self.rejected = rejected
+        self.stats = ImportStats()
+
+    def batches(self, rows: Iterator[dict | None]) -> Iterator[list[tuple]]:
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            try:
+                record = parse_row(row)
+            except ValueError as exc:
+                self.stats.invalid += 1
+                logger.warning("Skipping invalid row %d: %s" % (line, exc))
+                if self.rejected is not None:
+                    self.rejected.write("%d\t%s\n" % (line, exc))
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def hash_batch(self, batch: list[tuple]) -> list[tuple]:
+        """Хеширует открытые пароли пачки, раздавая их воркерам кусками."""
+        plain = [i for i, record in enumerate(batch) if isinstance(record[2], str)]
+        if not plain:
+            return batch
+        loop = asyncio.get_running_loop()
+        chunk = -(-len(plain) // self.workers)
+        parts = [plain[i : i + chunk] for i in range(0, len(plain), chunk)]
+        hashed = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.pool,
+                    hash_passwords,
+                    [batch[i][2] for i in part],
+                    HASH_PARAMS,
+                )
+                for part in parts
+            )
+        )
+        for part, hashes in zip(parts, hashed):
+            for i, password in zip(part, hashes):
+                batch[i] = (*batch[i][:2], password, *batch[i][3:])
+        return batch
+
+    async def load_batch(self, connection, batch: list[tuple]) -> None:
+        async with connection.transaction():
+            await connection.copy_records_to_table(
+                "users_import", records=batch, columns=COLUMNS
+            )
+            inserted = {row["id"] for row in await connection.fetch(_MOVE_STAGING)}
+        self.stats.processed += len(batch)
+        self.stats.inserted += len(inserted)
+        self.stats.duplicates += len(batch) - len(inserted)
+        if self.duplicates is not None:
+            for record in batch:
+                if record[0] not in inserted:
+                    self.duplicates.write("%s\n" % record[1])
+        logger.info(str(self.stats))
+
+    async def run(self, rows: Iterator[dict | None]) -> ImportStats:
+        async with db_helper.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            connection = raw.driver_connection
+            await connection.execute(_CREATE_STAGING)
+            pending: asyncio.Task | None = None
+            for batch in self.batches(rows):
+                hashing = asyncio.create_task(self.hash_batch(batch))
+                if pending is not None:
+                    await self.load_batch(connection, await pending)
+                pending = hashing
+            if pending is not None:
+                await self.load_batch(connection, await pending)
+        return self.stats
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import users")
+    parser.add_argument("path", help="input file, '-' for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"))
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duplicates", help="file to write skipped emails to")
+    parser.add_argument(
+        "--rejected", help="file to write invalid row numbers and reasons to"
+    )
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith(".ndjson") else "csv")
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="")
+    duplicates = open(args.duplicates, "w") if args.duplicates else None
+    rejected = open(args.rejected, "w") if args.rejected else None
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            importer = BulkImporter(
+                pool=pool,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                duplicates=duplicates,
+                rejected=rejected,
+            )
+            stats = await importer.run(read_rows(stream, fmt))
+    finally:
+        stream.close()
+        for output in (duplicates, rejected):
+            if output is not None:
+                output.close()
+        await db_helper.engine.dispose()
+    logger.info("Import finished: %s" % stats)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
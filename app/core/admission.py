@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED
+
+"""Допуск к CPU-тяжелым участкам запросов (хеширование паролей).
+
+Одновременно выполняется не больше concurrency запросов, еще queue_size
+ждут в очереди не дольше queue_timeout секунд. Остальные сразу получают
+503 с Retry-After: при перегрузке часть запросов быстро отказывает, а
+остальные укладываются в таймауты клиентов, вместо того чтобы все
+вставали в бесконечную очередь к пулу bcrypt. Дешевые эндпоинты
+(refresh, проверка токена) через контроллер не проходят и сохраняют
+свою пропускную способность.
+"""
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        enabled: bool,
+        concurrency: int,
+        queue_size: int,
+        queue_timeout: float,
+        retry_after: int,
+    ) -> None:
+        self.name = name
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+        self._slots: asyncio.Semaphore | None = None
+
+    def _shed(self, reason: str) -> HTTPException:
+        ADMISSION_SHED.labels(self.name, reason).inc()
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    async def _acquire(self) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        if not self._slots.locked():
+            # свободный слот занимается сразу, без ожидания
+            await self._slots.acquire()
+            return
+        if self.waiting >= self.queue_size:
+            raise self._shed("queue_full")
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._shed("timeout")
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.labels(self.name).dec()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if not self.enabled:
+            yield
+            return
+        await self._acquire()
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+        try:
+            yield
+        finally:
+            ADMISSION_IN_FLIGHT.labels(self.name).dec()
+            self._slots.release()  # type: ignore[union-attr]
+
+
+hashing_admission = AdmissionController(
+    name="password_hashing",
+    enabled=settings.security.admission.enabled,
+    concurrency=settings.security.admission.concurrency,
+    queue_size=settings.security.admission.queue_size,
+    queue_timeout=settings.security.admission.queue_timeout_seconds,
+    retry_after=settings.security.admission.retry_after_seconds,
+)
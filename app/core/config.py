@@ -1,7 +1,14 @@
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal, Self
 
-from pydantic import AnyUrl, BaseModel, BeforeValidator, computed_field
+from pydantic import (
+    AnyUrl,
+    BaseModel,
+    BeforeValidator,
+    Field,
+    computed_field,
+    model_validator,
+)
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -11,18 +18,136 @@ from app.core.utils import parse_cors
 BASE_DIR = Path(__file__).parent.parent.parent
 
 
+JWTAlgorithm = Literal["RS256", "ES256", "EdDSA"]
+
+
 class JWTConfig(BaseModel):
-    algorithm: str = "RS256"
+    # Алгоритм текущего ключа подписи. Токены проверяются алгоритмом того
+    # ключа из кольца, на который указывает kid, поэтому при смене
+    # алгоритма старый публичный ключ кладется в previous_public_keys.
+    algorithm: JWTAlgorithm = "RS256"
+    # Если задан, токены с другими алгоритмами отклоняются; пустой список
+    # разрешает алгоритмы всех ключей кольца
+    accepted_algorithms: list[JWTAlgorithm] = []
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 7
     verify_token_expire_days: int = 10
     resetpass_token_expire_minutes: int = 60
 
+    @model_validator(mode="after")
+    def check_accepted_algorithms(self) -> Self:
+        if self.accepted_algorithms and self.algorithm not in self.accepted_algorithms:
+            raise ValueError(
+                "accepted_algorithms must include the signing algorithm %s"
+                % self.algorithm
+            )
+        return self
+
+
+class PasswordHashConfig(BaseModel):
+    scheme: Literal["bcrypt", "argon2id"] = "bcrypt"
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31)
+    argon2_time_cost: int = Field(default=3, ge=1)
+    argon2_memory_cost: int = Field(default=65536, ge=8)  # KiB
+    argon2_parallelism: int = Field(default=4, ge=1)
+
+
+class CryptoExecutorConfig(BaseModel):
+    kind: Literal["thread", "process"] = "thread"
+    pool_size: int = 4
+    queue_size: int = 32
+
+
+class AdmissionConfig(BaseModel):
+    enabled: bool = True
+    concurrency: int = 8
+    queue_size: int = 32
+    queue_timeout_seconds: float = 2.0
+    retry_after_seconds: int = 1
+
+
+class IntrospectionConfig(BaseModel):
+    # client_id -> client_secret ресурсных серверов; пусто - эндпоинт выключен
+    clients: dict[str, str] = {}
+    max_batch_size: int = 100
+
+
+class JWKSConfig(BaseModel):
+    # Внешний адрес сервиса: уходит в iss токенов и в discovery. Без него
+    # iss не ставится и не проверяется, а discovery не отдается
+    issuer: str | None = None
+    # Не больше, чем старый ключ остается в previous_public_keys после
+    # ротации, иначе потребители не увидят новый kid вовремя
+    max_age_seconds: int = 300
+
+    @model_validator(mode="after")
+    def strip_issuer(self) -> Self:
+        if self.issuer is not None:
+            self.issuer = self.issuer.rstrip("/")
+        return self
+
+
+class RevocationStoreConfig(BaseModel):
+    bucket_seconds: int = 3600
+    # Отзывов на бакет / shards должно быть <= 128, чтобы хеши оставались
+    # listpack: для 10M отзывов refresh-токенов за 7 дней это ~60K на
+    # часовой бакет, то есть ~512 шардов
+    shards: int = 512
+    # Проверять и прежние ключи blacklist:<jti>; выключается, когда истек
+    # срок, напечатанный python -m app.revocation_migrate
+    legacy_fallback: bool = True
+
+
+class RevocationFilterConfig(BaseModel):
+    enabled: bool = True
+    # Минимальная емкость фильтра; при перестройке она вдвое больше числа
+    # отзывов, найденных прошлым сканированием
+    capacity: int = 1_000_000
+    error_rate: float = 0.001
+    rebuild_interval_seconds: int = 3600
+
+
+class UserCacheConfig(BaseModel):
+    local_ttl_seconds: float = 5
+    redis_ttl_seconds: int = 60
+    max_size: int = 10_000
+    # Сколько после invalidate() запрещено заполнять кэш: дольше любого
+    # чтения из базы, начатого до изменения
+    tombstone_seconds: float = Field(default=5, gt=0)
+
+
+class LoginThrottleConfig(BaseModel):
+    enabled: bool = True
+    window_seconds: int = 300
+    max_attempts_per_ip: int = 50
+    max_attempts_per_account: int = 10
+    lockout_base_seconds: int = Field(default=30, gt=0)
+    lockout_max_seconds: int = Field(default=3600, gt=0)
+
 
 class SecurityConfig(BaseModel):
     private_key: Path = BASE_DIR / "app" / "core" / "certs" / "private_key.pem"
     public_key: Path = BASE_DIR / "app" / "core" / "certs" / "public_key.pem"
+    previous_public_keys: list[Path] = []
+    key_reload_interval_seconds: int = 60
+    token_cache_size: int = 10_000
     jwt: JWTConfig = JWTConfig()
+    password_hash: PasswordHashConfig = PasswordHashConfig()
+    crypto: CryptoExecutorConfig = CryptoExecutorConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    revocation_store: RevocationStoreConfig = RevocationStoreConfig()
+    revocation_filter: RevocationFilterConfig = RevocationFilterConfig()
+    user_cache: UserCacheConfig = UserCacheConfig()
+    login_throttle: LoginThrottleConfig = LoginThrottleConfig()
+    introspection: IntrospectionConfig = IntrospectionConfig()
+    jwks: JWKSConfig = JWKSConfig()
+
+
+class DebugConfig(BaseModel):
+    server_timing: bool = False
+    profiler_token: str | None = None
+    profiler_interval_ms: float = 5
+    profile_dir: Path = BASE_DIR / "profiles"
 
 
 class SMTPConfig(BaseModel):
@@ -30,6 +155,14 @@ class SMTPConfig(BaseModel):
     port: int
     username: str
     password: str
+    use_tls: bool = True
+    pool_size: int = 4
+    batch_size: int = 50
+    max_retries: int = 5
+    retry_backoff_seconds: float = 2
+    consumer: str | None = None
+    template_cache_dir: Path | None = None
+    default_locale: str | None = None
 
 
 class PostgresConfig(BaseModel):
@@ -42,8 +175,17 @@ class PostgresConfig(BaseModel):
 
     pool_size: int = 50
     max_overflow: int = 10
+    # соединения, открываемые при старте воркера, до приема запросов
+    min_connections: int = 5
     echo: bool = False
 
+    # Полные URL реплик (postgresql+asyncpg://...) для чтений на путях
+    # авторизации; реплика с отставанием больше replica_max_lag_seconds
+    # или не ответившая на проверку не используется до следующей проверки
+    replica_urls: list[str] = []
+    replica_max_lag_seconds: float = 1.0
+    replica_check_interval_seconds: float = 1.0
+
     naming_convention: dict[str, str] = {
         "ix": "ix_%(column_0_label)s",
         "uq": "uq_%(table_name)s_%(column_0_name)s",
@@ -63,6 +205,13 @@ class PostgresConfig(BaseModel):
             path=self.db,
         )
 
+    @property
+    def replica_staleness_seconds(self) -> float:
+        """Насколько чтение с реплики может отставать от записи."""
+        if not self.replica_urls:
+            return 0
+        return self.replica_max_lag_seconds + self.replica_check_interval_seconds
+
 
 class RedisConfig(BaseModel):
 
@@ -70,6 +219,7 @@ class RedisConfig(BaseModel):
     port: int
     db: str
     max_connections: int = 100
+    min_connections: int = 5
     decode_responses: bool = True
 
     @property
@@ -113,6 +263,7 @@ class Settings(BaseSettings):
     redis: RedisConfig
     security: SecurityConfig = SecurityConfig()
     smtp: SMTPConfig
+    debug: DebugConfig = DebugConfig()
 
 
 settings = Settings()  # type: ignore
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Literal, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_SHED
+
+T = TypeVar("T")
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class CryptoExecutor:
+    """Пул для CPU-тяжелых операций (bcrypt), чтобы не блокировать event loop.
+
+    В пуле одновременно не больше pool_size + queue_size задач (выполняемые
+    и ждущие свободного воркера), сверх этого run() сразу поднимает
+    ExecutorBusy, и запрос получает 503 вместо бесконечного ожидания.
+    """
+
+    def __init__(
+        self,
+        kind: Literal["thread", "process"],
+        pool_size: int,
+        queue_size: int,
+    ) -> None:
+        self.kind = kind
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self._executor: Executor | None = None
+        self.pending = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.pool_size,
+                    thread_name_prefix="crypto",
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.pool_size + self.queue_size:
+            ADMISSION_SHED.labels("crypto_executor", "queue_full").inc()
+            raise ExecutorBusy
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def warm_up(self) -> None:
+        """Запускает все воркеры пула, чтобы первые логины не ждали
+        старта процессов."""
+        await asyncio.gather(
+            *(self.run(time.sleep, 0.01) for _ in range(self.pool_size))
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+crypto_executor = CryptoExecutor(
+    kind=settings.security.crypto.kind,
+    pool_size=settings.security.crypto.pool_size,
+    queue_size=settings.security.crypto.queue_size,
+)
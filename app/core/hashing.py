@@ -0,0 +1,107 @@
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal
+
+import bcrypt
+from argon2 import PasswordHasher, Type, extract_parameters
+from argon2.exceptions import InvalidHashError, VerificationError
+
+"""Синхронные функции хэширования, выполняются в пуле CryptoExecutor.
+
+Параметры передаются явно в HashParams, а не читаются из settings, чтобы
+функции можно было отдавать в пул процессов без импорта конфигурации.
+Схема хеша определяется по его префиксу, поэтому проверка работает для
+старых хешей и после смены схемы или стоимости.
+"""
+
+logger = logging.getLogger(__name__)
+
+ARGON2ID_PREFIX = b"$argon2id$"
+# $2b$12$ + 22 символа соли и 31 символ хеша в алфавите bcrypt
+BCRYPT_HASH = re.compile(rb"\$2[aby]\$(0[4-9]|[12][0-9]|3[01])\$[./A-Za-z0-9]{53}")
+
+# verify() берет параметры из самого хеша, настройки экземпляра не важны
+_argon2_verifier = PasswordHasher()
+
+
+@dataclass(frozen=True)
+class HashParams:
+    scheme: Literal["bcrypt", "argon2id"] = "bcrypt"
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+
+
+@lru_cache
+def _argon2(time_cost: int, memory_cost: int, parallelism: int) -> PasswordHasher:
+    return PasswordHasher(
+        time_cost=time_cost,
+        memory_cost=memory_cost,
+        parallelism=parallelism,
+    )
+
+
+def _argon2_for(params: HashParams) -> PasswordHasher:
+    return _argon2(
+        params.argon2_time_cost,
+        params.argon2_memory_cost,
+        params.argon2_parallelism,
+    )
+
+
+def identify(hashed_password: bytes) -> str | None:
+    """Схема хеша или None, если это не корректный хеш bcrypt/argon2id:
+    одного префикса мало, с $2b$ может начинаться и обычный пароль."""
+    if BCRYPT_HASH.fullmatch(hashed_password):
+        return "bcrypt"
+    if hashed_password.startswith(ARGON2ID_PREFIX):
+        try:
+            parameters = extract_parameters(hashed_password.decode())
+        except (InvalidHashError, UnicodeDecodeError):
+            return None
+        if parameters.type == Type.ID:
+            return "argon2id"
+    return None
+
+
+def hash_password(password: str, params: HashParams) -> bytes:
+    if params.scheme == "argon2id":
+        return _argon2_for(params).hash(password).encode()
+    salt = bcrypt.gensalt(rounds=params.bcrypt_rounds)
+    return bcrypt.hashpw(
+        password=password.encode(),
+        salt=salt,
+    )
+
+
+def hash_passwords(passwords: list[str], params: HashParams) -> list[bytes]:
+    """Пачка хешей за один вызов: меньше пересылок между процессами."""
+    return [hash_password(password, params) for password in passwords]
+
+
+def validate_password(password: str, hashed_password: bytes) -> bool:
+    scheme = identify(hashed_password)
+    if scheme is None:
+        logger.error("Stored password hash has an unknown format")
+        return False
+    if scheme == "argon2id":
+        try:
+            return _argon2_verifier.verify(hashed_password.decode(), password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return bcrypt.checkpw(
+        password=password.encode(),
+        hashed_password=hashed_password,
+    )
+
+
+def needs_rehash(hashed_password: bytes, params: HashParams) -> bool:
+    """Хеш создан другой схемой или с другими параметрами стоимости."""
+    if identify(hashed_password) != params.scheme:
+        return True
+    if params.scheme == "argon2id":
+        return _argon2_for(params).check_needs_rehash(hashed_password.decode())
+    return int(hashed_password[4:6]) != params.bcrypt_rounds
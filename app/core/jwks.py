@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.core.config import settings
+from app.core.keys import JWTKey, KeyRing, key_ring
+
+"""Публикация ключей проверки JWT: JWKS и OpenID discovery.
+
+Документы сериализуются один раз и отдаются готовыми байтами вместе со
+строгим ETag, посчитанным по содержимому. Кэш сбрасывается через
+KeyRing.on_reload, то есть только когда меняются файлы ключей; между
+перезагрузками запрос к JWKS не трогает криптографию и JSON.
+
+Discovery описывает только то, что сервис делает: issuer совпадает с iss
+в токенах, а ID-токены не выпускаются, поэтому
+id_token_signing_alg_values_supported в документе нет.
+"""
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64_int(value: int, length: int | None = None) -> str:
+    length = length or (value.bit_length() + 7) // 8
+    return _b64(value.to_bytes(length, "big"))
+
+
+def public_jwk(key: JWTKey) -> dict:
+    """Публичная часть ключа в формате JWK (RFC 7517, 7518, 8037)."""
+    jwk = {"kid": key.kid, "use": "sig", "alg": key.algorithm}
+    public_key = key.public_key
+    if isinstance(public_key, rsa.RSAPublicKey):
+        numbers = public_key.public_numbers()
+        jwk.update(kty="RSA", n=_b64_int(numbers.n), e=_b64_int(numbers.e))
+    elif isinstance(public_key, ec.EllipticCurvePublicKey):
+        numbers = public_key.public_numbers()
+        size = (public_key.curve.key_size + 7) // 8
+        jwk.update(
+            kty="EC",
+            crv="P-256",
+            x=_b64_int(numbers.x, size),
+            y=_b64_int(numbers.y, size),
+        )
+    elif isinstance(public_key, ed25519.Ed25519PublicKey):
+        raw = public_key.public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw,
+        )
+        jwk.update(kty="OKP", crv="Ed25519", x=_b64(raw))
+    else:
+        raise ValueError("Unsupported JWT key type: %s" % type(public_key).__name__)
+    return jwk
+
+
+@dataclass(frozen=True)
+class Document:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Document":
+        body = json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+        digest = hashlib.sha256(body).digest()[:16]
+        return cls(body=body, etag='"%s"' % _b64(digest))
+
+
+class KeyPublisher:
+    def __init__(self, ring: KeyRing) -> None:
+        self.ring = ring
+        self._jwks: Document | None = None
+        self._discovery: Document | None = None
+        ring.on_reload(self.invalidate)
+
+    def invalidate(self) -> None:
+        self._jwks = None
+        self._discovery = None
+
+    def jwks(self) -> Document:
+        # verification_keys перечитывает ключи при смене файлов и через
+        # on_reload сбрасывает кэш до того, как он будет прочитан ниже
+        keys = self.ring.verification_keys
+        if self._jwks is None:
+            self._jwks = Document.from_json({"keys": [public_jwk(key) for key in keys]})
+        return self._jwks
+
+    def discovery(self, issuer: str) -> Document:
+        if self._discovery is None:
+            api = issuer + settings.api_v1_str
+            self._discovery = Document.from_json(
+                {
+                    "issuer": issuer,
+                    "jwks_uri": issuer + "/.well-known/jwks.json",
+                    "token_endpoint": api + "/auth/login",
+                    "introspection_endpoint": api + "/auth/introspect",
+                    "introspection_endpoint_auth_methods_supported": [
+                        "client_secret_basic"
+                    ],
+                    "grant_types_supported": ["password", "refresh_token"],
+                    "response_types_supported": ["token"],
+                    "subject_types_supported": ["public"],
+                }
+            )
+        return self._discovery
+
+
+key_publisher = KeyPublisher(key_ring)
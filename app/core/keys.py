@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class JWTKey:
+    kid: str
+    algorithm: str
+    public_key: PublicKeyTypes
+    private_key: PrivateKeyTypes | None = None
+
+
+def public_der(public_key: PublicKeyTypes) -> bytes:
+    return public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+
+
+def key_id(public_key: PublicKeyTypes) -> str:
+    digest = hashlib.sha256(public_der(public_key)).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def key_algorithm(public_key: PublicKeyTypes) -> str:
+    """JWT-алгоритм, которым подписывает ключ такого типа."""
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and isinstance(
+        public_key.curve, ec.SECP256R1
+    ):
+        return "ES256"
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    raise ValueError("Unsupported JWT key type: %s" % type(public_key).__name__)
+
+
+class KeyRing:
+    """Разобранные ключи для подписи и проверки JWT.
+
+    Подписывает текущий приватный ключ, проверять токены можно любым
+    ключом из кольца (текущим и предыдущими публичными), ключ выбирается
+    по заголовку kid. Алгоритм определяется типом ключа, так что на время
+    смены алгоритма старые RSA-ключи продолжают проверять свои токены.
+    Ключи с алгоритмами вне accepted_algorithms в кольцо не попадают.
+    Файлы перечитываются, если изменилось их mtime, но не чаще чем раз в
+    reload_interval секунд; если приватный и публичный ключи не составляют
+    пару, перезагрузка отклоняется и остаются прежние ключи.
+    """
+
+    def __init__(
+        self,
+        private_key: Path,
+        public_key: Path,
+        previous_public_keys: list[Path],
+        algorithm: str,
+        accepted_algorithms: list[str],
+        reload_interval: float,
+    ) -> None:
+        self.private_key_path = private_key
+        self.public_key_path = public_key
+        self.previous_public_key_paths = previous_public_keys
+        self.algorithm = algorithm
+        self.accepted_algorithms = set(accepted_algorithms)
+        self.reload_interval = reload_interval
+
+        self._signing_key: JWTKey | None = None
+        self._keys: dict[str, JWTKey] = {}
+        self._mtimes: tuple[int, ...] = ()
+        self._checked_at = 0.0
+        self._reload_callbacks: list[Callable[[], None]] = []
+
+    def on_reload(self, callback: Callable[[], None]) -> None:
+        self._reload_callbacks.append(callback)
+
+    @property
+    def paths(self) -> list[Path]:
+        return [
+            self.private_key_path,
+            self.public_key_path,
+            *self.previous_public_key_paths,
+        ]
+
+    def load(self) -> None:
+        mtimes = tuple(path.stat().st_mtime_ns for path in self.paths)
+        private_key = serialization.load_pem_private_key(
+            self.private_key_path.read_bytes(), password=None
+        )
+        public_key = serialization.load_pem_public_key(
+            self.public_key_path.read_bytes()
+        )
+        if key_algorithm(public_key) != self.algorithm:
+            raise ValueError(
+                "%s holds a %s key, but jwt.algorithm is %s"
+                % (self.public_key_path, key_algorithm(public_key), self.algorithm)
+            )
+        # kid считается по публичному файлу, поэтому он обязан быть парой
+        # приватному, иначе опубликованный ключ не проверит подписи
+        if public_der(private_key.public_key()) != public_der(public_key):
+            raise ValueError(
+                "%s does not match %s" % (self.public_key_path, self.private_key_path)
+            )
+        signing_key = JWTKey(
+            kid=key_id(public_key),
+            algorithm=self.algorithm,
+            public_key=public_key,
+            private_key=private_key,
+        )
+
+        keys = {signing_key.kid: signing_key}
+        for path in self.previous_public_key_paths:
+            previous_key = serialization.load_pem_public_key(path.read_bytes())
+            algorithm = key_algorithm(previous_key)
+            if self.accepted_algorithms and algorithm not in self.accepted_algorithms:
+                logger.warning("Skipping %s key %s: not accepted" % (algorithm, path))
+                continue
+            kid = key_id(previous_key)
+            keys.setdefault(
+                kid,
+                JWTKey(kid=kid, algorithm=algorithm, public_key=previous_key),
+            )
+
+        self._signing_key = signing_key
+        self._keys = keys
+        self._mtimes = mtimes
+        self._checked_at = time.monotonic()
+        for callback in self._reload_callbacks:
+            callback()
+
+    def maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self._signing_key is not None and (
+            now - self._checked_at < self.reload_interval
+        ):
+            return
+        self._checked_at = now
+        if self._signing_key is None:
+            self.load()
+            return
+        try:
+            mtimes = tuple(path.stat().st_mtime_ns for path in self.paths)
+            if mtimes != self._mtimes:
+                self.load()
+        except (OSError, ValueError, TypeError, UnsupportedAlgorithm) as e:
+            # например, ротация заменяет файлы не атомарно или записала
+            # только один из них: остаемся на прежних ключах и пробуем
+            # снова через reload_interval
+            logger.error(
+                "Keeping current JWT keys, reload failed: %s: %s"
+                % (type(e).__name__, e)
+            )
+
+    @property
+    def signing_key(self) -> JWTKey:
+        self.maybe_reload()
+        return self._signing_key  # type: ignore[return-value]
+
+    @property
+    def verification_keys(self) -> list[JWTKey]:
+        self.maybe_reload()
+        return list(self._keys.values())
+
+    def get(self, kid: str | None) -> JWTKey | None:
+        self.maybe_reload()
+        if kid is None:
+            return self._signing_key
+        return self._keys.get(kid)
+
+
+key_ring = KeyRing(
+    private_key=settings.security.private_key,
+    public_key=settings.security.public_key,
+    previous_public_keys=settings.security.previous_public_keys,
+    algorithm=settings.security.jwt.algorithm,
+    accepted_algorithms=settings.security.jwt.accepted_algorithms,
+    reload_interval=settings.security.key_reload_interval_seconds,
+)
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.core import timing
+
+"""Метрики Prometheus.
+
+При нескольких воркерах uvicorn задайте PROMETHEUS_MULTIPROC_DIR (пустой
+каталог, общий для воркеров) до запуска процесса: тогда /metrics любого
+воркера отдает сумму по всем процессам.
+"""
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+FAST_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "authflow_password_hash_seconds",
+    "Password hashing and verification, including wait for the crypto pool",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0),
+)
+JWT_SECONDS = Histogram(
+    "authflow_jwt_seconds",
+    "JWT signing and signature verification",
+    ["operation"],
+    buckets=FAST_BUCKETS,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "authflow_redis_command_seconds",
+    "Redis round trips on the auth paths",
+    ["operation"],
+    buckets=FAST_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "authflow_db_query_seconds",
+    "SQL statements issued from app.database.crud",
+    ["query"],
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "authflow_db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "authflow_db_pool_connections",
+    "SQLAlchemy pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "authflow_db_replica_lag_seconds",
+    "Replication lag seen by the last health check, -1 if it failed",
+    ["replica"],
+    multiprocess_mode="livemax",
+)
+DB_READ_SESSIONS = Counter(
+    "authflow_db_read_sessions_total",
+    "Read-only sessions by the server they were routed to",
+    ["target"],
+)
+REDIS_POOL_CONNECTIONS = Gauge(
+    "authflow_redis_pool_connections",
+    "Redis ConnectionPool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+TOKEN_CACHE_LOOKUPS = Counter(
+    "authflow_token_cache_lookups_total",
+    "Lookups in the cache of verified JWTs by result",
+    ["result"],
+)
+TOKEN_CACHE_ENTRIES = Gauge(
+    "authflow_token_cache_entries",
+    "Verified JWTs held in the token cache",
+    multiprocess_mode="livesum",
+)
+REVOCATION_FILTER_ENTRIES = Gauge(
+    "authflow_revocation_filter_entries",
+    "Revoked jtis in the local Bloom filter",
+    multiprocess_mode="livemax",
+)
+REVOCATION_FILTER_CAPACITY = Gauge(
+    "authflow_revocation_filter_capacity",
+    "Entries the local Bloom filter was sized for",
+    multiprocess_mode="livemax",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "authflow_admission_in_flight",
+    "Requests holding an admission slot",
+    ["controller"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "authflow_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["controller"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_SHED = Counter(
+    "authflow_admission_shed_total",
+    "Requests rejected with 503 by admission control",
+    ["controller", "reason"],
+)
+
+
+def _timing_phase(histogram: Histogram, label: str | None) -> str:
+    if histogram is JWT_SECONDS:
+        return "token_verify" if label == "verify" else "token_sign"
+    if histogram is REDIS_COMMAND_SECONDS:
+        return "blacklist" if label == "blacklist_lookup" else "redis"
+    if histogram is DB_POOL_CHECKOUT_SECONDS:
+        return "db_pool"
+    if histogram is DB_QUERY_SECONDS:
+        return "db"
+    return "hashing"
+
+
+@contextmanager
+def observe(histogram: Histogram, label: str | None = None) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        target = histogram.labels(label) if label is not None else histogram
+        target.observe(elapsed)
+        timing.record(_timing_phase(histogram, label), elapsed)
+
+
+def sample_pools(db_pool, redis_pool) -> None:
+    DB_POOL_CONNECTIONS.labels("checked_out").set(db_pool.checkedout())
+    DB_POOL_CONNECTIONS.labels("idle").set(db_pool.checkedin())
+    REDIS_POOL_CONNECTIONS.labels("in_use").set(len(redis_pool._in_use_connections))
+    REDIS_POOL_CONNECTIONS.labels("idle").set(len(redis_pool._available_connections))
+
+
+async def sample_pools_forever(db_pool, redis_pool, interval: float = 5) -> None:
+    while True:
+        sample_pools(db_pool, redis_pool)
+        await asyncio.sleep(interval)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def cleanup_dead_processes() -> None:
+    """Убирает livesum-гейджи завершившихся воркеров."""
+    if MULTIPROC_DIR is None:
+        return
+    for path in Path(MULTIPROC_DIR).glob("gauge_live*_*.db"):
+        pid = int(path.stem.rsplit("_", 1)[1])
+        if not _is_alive(pid):
+            multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if MULTIPROC_DIR is None:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
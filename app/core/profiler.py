@@ -0,0 +1,185 @@
+import asyncio
+import hmac
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+"""Семплирующий профайлер для разбора задержек на живом сервисе.
+
+Фоновый поток раз в interval снимает стек потока event loop через
+sys._current_frames() и копит его в формате folded stacks, который
+понимают flamegraph.pl, speedscope и inferno. Снимается весь поток, а не
+одна корутина, поэтому в профиль одного запроса попадают и конкурентные
+запросы того же воркера. Пока профилирование не запущено, никаких
+затрат нет: поток не создается, а middleware подключается только при
+заданном settings.debug.profiler_token.
+"""
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return "%s:%s" % (frame.f_globals.get("__name__", "?"), code.co_qualname)
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stopped.set()
+        self._thread.join()
+        return "".join(
+            "%s %d\n" % (stack, count) for stack, count in self.samples.items()
+        )
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class ProfilerManager:
+    """Не более одного профилирования на процесс одновременно."""
+
+    def __init__(self, interval: float, directory: Path) -> None:
+        self.interval = interval
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def begin(self) -> SamplingProfiler:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        profiler.start()
+        return profiler
+
+    def end(self, profiler: SamplingProfiler) -> str:
+        try:
+            return profiler.stop()
+        finally:
+            self._lock.release()
+
+    async def capture(self, seconds: float) -> str:
+        profiler = self.begin()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            folded = self.end(profiler)
+        return folded
+
+    def path(self, profile_id: str) -> Path:
+        return self.directory / ("%s.folded" % profile_id)
+
+    def save(self, profile_id: str, folded: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path(profile_id).write_text(folded)
+
+    def load(self, profile_id: str) -> str | None:
+        try:
+            uuid.UUID(profile_id)
+            return self.path(profile_id).read_text()
+        except (ValueError, FileNotFoundError):
+            return None
+
+
+class ProfilerMiddleware:
+    """Профилирует запрос, пришедший с заголовком X-Profile: <profiler_token>
+    и access-токеном админа в Authorization: Bearer.
+
+    Одного статического токена мало: он живет в конфиге и логах деплоя,
+    а профиль раскрывает стеки конкурентных запросов. Без админского
+    токена запрос обрабатывается без профилирования. Профиль сохраняется в
+    settings.debug.profile_dir, его идентификатор возвращается в
+    X-Profile-Id и доступен админу через /debug/profiles.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        manager: ProfilerManager,
+        is_admin: Callable[[str], Awaitable[bool]],
+    ) -> None:
+        self.app = app
+        self.manager = manager
+        self.is_admin = is_admin
+        self.token = settings.debug.profiler_token.encode()
+
+    async def _requested(self, scope: Scope) -> bool:
+        headers = dict(scope["headers"])
+        token = headers.get(PROFILE_HEADER.encode())
+        if token is None or not hmac.compare_digest(token, self.token):
+            return False
+        scheme, _, bearer = headers.get(b"authorization", b"").partition(b" ")
+        if scheme.lower() != b"bearer" or not await self.is_admin(
+            bearer.decode("latin-1")
+        ):
+            logger.warning("Profiling requires an admin access token")
+            return False
+        return True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        try:
+            profiler = self.manager.begin()
+        except ProfilerBusy:
+            logger.warning("Profiler is busy, request is not profiled")
+            await self.app(scope, receive, send)
+            return
+        profile_id = str(uuid.uuid4())
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            folded = self.manager.end(profiler)
+            await asyncio.to_thread(self.manager.save, profile_id, folded)
+            logger.info(
+                "Profiled %s in %.1f ms: %s"
+                % (scope["path"], (time.perf_counter() - started) * 1000, profile_id)
+            )
+
+
+profiler_manager = ProfilerManager(
+    interval=settings.debug.profiler_interval_ms / 1000,
+    directory=settings.debug.profile_dir,
+)
@@ -3,28 +3,35 @@ from datetime import datetime, timedelta, timezone
 from enum import Enum
 from typing import Literal
 
-import bcrypt
 import jwt
 
+from app.core import hashing
 from app.core.config import settings
+from app.core.executor import crypto_executor
+from app.core.keys import JWTKey, key_ring
+from app.core.metrics import JWT_SECONDS, PASSWORD_HASH_SECONDS, observe
 from app.models.user import User
+from app.schemas import UserState
 
 """Функции хэширования и валидации пароля"""
 
+HASH_PARAMS = hashing.HashParams(**settings.security.password_hash.model_dump())
 
-def hash_password(password: str) -> bytes:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(
-        password=password.encode(),
-        salt=salt,
-    )
 
+async def hash_password(password: str) -> bytes:
+    with observe(PASSWORD_HASH_SECONDS, "hash"):
+        return await crypto_executor.run(hashing.hash_password, password, HASH_PARAMS)
 
-def validate_password(password: str, hashed_password: bytes) -> bool:
-    return bcrypt.checkpw(
-        password=password.encode(),
-        hashed_password=hashed_password,
-    )
+
+async def validate_password(password: str, hashed_password: bytes) -> bool:
+    with observe(PASSWORD_HASH_SECONDS, "validate"):
+        return await crypto_executor.run(
+            hashing.validate_password, password, hashed_password
+        )
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    return hashing.needs_rehash(hashed_password, HASH_PARAMS)
 
 
 """Функции для работы с JWT"""
@@ -40,42 +47,55 @@ class TokenTypes(str, Enum):
 PAYLOAD_KEY_TOKEN_TYPE = "type"
 PAYLOAD_KEY_USER_ID = "user_id"
 PAYLOAD_KEY_SUB = "sub"
+PAYLOAD_KEY_EPOCH = "epoch"
+PAYLOAD_KEY_FAMILY = "fam"
+PAYLOAD_KEY_ISSUER = "iss"
 
 
 def encode_jwt(
     payload: dict,
-    private_key: str = settings.security.private_key.read_text(),
-    algorithm: str = settings.security.jwt.algorithm,
+    key: JWTKey | None = None,
     expire_minutes: int = settings.security.jwt.access_token_expire_minutes,
     expires_delta: timedelta | None = None,
 ) -> str:
+    key = key or key_ring.signing_key
     to_encode = payload.copy()
     now = datetime.now(timezone.utc)
     if expires_delta:
         expire = now + expires_delta
     else:
         expire = now + timedelta(minutes=expire_minutes)
-    jti = str(uuid.uuid4())
-    to_encode.update(exp=expire, iat=now, jti=jti)
-    encoded_jwt = jwt.encode(
-        payload=to_encode,
-        key=private_key,
-        algorithm=algorithm,
-    )
+    to_encode.setdefault("jti", str(uuid.uuid4()))
+    to_encode.update(exp=expire, iat=now)
+    if settings.security.jwks.issuer is not None:
+        to_encode[PAYLOAD_KEY_ISSUER] = settings.security.jwks.issuer
+    with observe(JWT_SECONDS, "sign"):
+        encoded_jwt = jwt.encode(
+            payload=to_encode,
+            key=key.private_key,  # type: ignore[arg-type]
+            algorithm=key.algorithm,
+            headers={"kid": key.kid},
+        )
     return encoded_jwt
 
 
-def decode_jwt(
-    token: str,
-    public_key: str = settings.security.public_key.read_text(),
-    algorithm: str = settings.security.jwt.algorithm,
-):
-
-    decoded_jwt = jwt.decode(
-        jwt=token,
-        key=public_key,
-        algorithms=[algorithm],
-    )
+def decode_jwt(token: str) -> dict:
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = key_ring.get(kid)
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown key id: %s" % kid)
+
+    with observe(JWT_SECONDS, "verify"):
+        decoded_jwt = jwt.decode(
+            jwt=token,
+            key=key.public_key,  # type: ignore[arg-type]
+            algorithms=[key.algorithm],
+        )
+    # токены, выпущенные до настройки issuer, iss не содержат и
+    # принимаются до истечения; чужой iss отклоняется
+    issuer = decoded_jwt.get(PAYLOAD_KEY_ISSUER)
+    if issuer is not None and issuer != settings.security.jwks.issuer:
+        raise jwt.InvalidIssuerError("Invalid issuer: %s" % issuer)
     return decoded_jwt
 
 
@@ -87,12 +107,22 @@ def create_token_by_type(
         TokenTypes.RESETPASS,
     ],
 ):
-    def create_token(user: User):
+    def create_token(
+        user: User | UserState,
+        epoch: int = 0,
+        jti: str | None = None,
+        family: str | None = None,
+    ):
         payload = {
             PAYLOAD_KEY_TOKEN_TYPE: token_type,
             PAYLOAD_KEY_USER_ID: str(user.id),
             PAYLOAD_KEY_SUB: user.email,
+            PAYLOAD_KEY_EPOCH: epoch,
         }
+        if jti is not None:
+            payload["jti"] = jti
+        if family is not None:
+            payload[PAYLOAD_KEY_FAMILY] = family
         expire_map = {
             TokenTypes.ACCESS: None,
             TokenTypes.REFRESH: timedelta(
@@ -0,0 +1,104 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+"""Разбивка времени запроса для заголовка Server-Timing.
+
+ServerTimingMiddleware кладет в contextvar RequestTiming, а observe() из
+app.core.metrics добавляет туда длительность каждой замеренной операции
+(проверка токена, обращения к Redis, SQL, хеширование). Границы эндпоинта
+отмечает TimedRoute, из них получаются фазы разрешения зависимостей и
+сериализации ответа. Вне запроса и при выключенной настройке record()
+сводится к чтению contextvar, а middleware и обертка эндпоинтов не
+устанавливаются вовсе.
+"""
+
+
+class RequestTiming:
+    __slots__ = ("started", "phases", "endpoint_started", "endpoint_finished")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.endpoint_started: float | None = None
+        self.endpoint_finished: float | None = None
+
+    def header(self, finished: float) -> str:
+        phases = dict(self.phases)
+        if self.endpoint_started is not None:
+            phases["deps"] = self.endpoint_started - self.started
+            if self.endpoint_finished is not None:
+                phases["endpoint"] = self.endpoint_finished - self.endpoint_started
+                phases["serialize"] = finished - self.endpoint_finished
+        phases["total"] = finished - self.started
+        return ", ".join(
+            "%s;dur=%.2f" % (name, seconds * 1000) for name, seconds in phases.items()
+        )
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def record(phase: str, seconds: float) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.phases[phase] = timing.phases.get(phase, 0.0) + seconds
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timing = _current.get()
+        if timing is None:
+            return await endpoint(*args, **kwargs)
+        timing.endpoint_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing.endpoint_finished = time.perf_counter()
+
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """Маршрут, отмечающий начало и конец эндпоинта для Server-Timing.
+
+    Синхронные эндпоинты не оборачиваются: FastAPI выполняет их в пуле
+    потоков, и асинхронная обертка это бы изменила.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs) -> None:
+        if settings.debug.server_timing and inspect.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timing.header(time.perf_counter()))
+            await send(message)
+
+        token = _current.set(timing)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,75 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.keys import key_ring
+from app.core.metrics import TOKEN_CACHE_ENTRIES, TOKEN_CACHE_LOOKUPS
+
+_HITS = TOKEN_CACHE_LOOKUPS.labels("hit")
+_MISSES = TOKEN_CACHE_LOOKUPS.labels("miss")
+
+
+class TokenCache:
+    """LRU-кэш уже проверенных JWT, чтобы не проверять RSA-подпись
+    на каждый запрос с одним и тем же токеном.
+
+    Ключ - sha256 от токена, запись живет не дольше exp токена.
+    Проверку по черному списку кэш не заменяет.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._keys_by_jti: dict[str, bytes] = {}
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _remove(self, key: bytes) -> None:
+        claims, _ = self._entries.pop(key)
+        self._keys_by_jti.pop(claims.get("jti"), None)
+        TOKEN_CACHE_ENTRIES.dec()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            _MISSES.inc()
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            _MISSES.inc()
+            return None
+        self._entries.move_to_end(key)
+        _HITS.inc()
+        return claims.copy()
+
+    def put(self, token: str, claims: dict) -> None:
+        if self.max_size <= 0 or "exp" not in claims:
+            return
+        key = self._key(token)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (claims.copy(), float(claims["exp"]))
+        TOKEN_CACHE_ENTRIES.inc()
+        if "jti" in claims:
+            self._keys_by_jti[claims["jti"]] = key
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def evict_jti(self, jti: str) -> None:
+        key = self._keys_by_jti.get(jti)
+        if key is not None:
+            self._remove(key)
+
+    def clear(self) -> None:
+        TOKEN_CACHE_ENTRIES.dec(len(self._entries))
+        self._entries.clear()
+        self._keys_by_jti.clear()
+
+
+token_cache = TokenCache(max_size=settings.security.token_cache_size)
+key_ring.on_reload(token_cache.clear)
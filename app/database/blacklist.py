@@ -0,0 +1,389 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import uuid
+from enum import IntEnum
+from typing import AsyncIterator
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+
+from app.core.config import settings
+from app.core.metrics import (
+    REDIS_COMMAND_SECONDS,
+    REVOCATION_FILTER_CAPACITY,
+    REVOCATION_FILTER_ENTRIES,
+    observe,
+)
+from app.core.token_cache import token_cache
+from app.database.events import event_bus
+from app.database.redis_db import redis_helper
+
+logger = logging.getLogger(__name__)
+
+# Прежний формат: строковый ключ на каждый отозванный jti. Читается, пока
+# включен revocation_store.legacy_fallback, и переносится скриптом
+# python -m app.revocation_migrate
+BLACKLIST_KEY = "blacklist:%s"
+REFRESH_FAMILY_KEY = "refresh_family:%s"
+REVOCATION_CHANNEL = "blacklist:events"
+FAMILY_REVOKED = "revoked"
+
+
+LEGACY_BUCKET = "legacy"
+_SCAN_BATCH = 500
+
+
+def jti_bytes(jti: str) -> bytes:
+    """16 байт вместо 36 символов; не-UUID jti хешируются до той же длины."""
+    try:
+        return uuid.UUID(jti).bytes
+    except ValueError:
+        return hashlib.blake2b(jti.encode(), digest_size=16).digest()
+
+
+class RevocationStore:
+    """Компактное хранение отозванных jti в Redis.
+
+    jti хранятся 16-байтовыми полями хешей <prefix>:<бакет>:<шард>, где
+    бакет - номер окна bucket_seconds, в которое попадает exp токена, а
+    шард - по младшим байтам jti. Хеш истекает целиком в конце своего
+    окна, когда все его токены уже просрочены. Шардов должно хватать, чтобы
+    в хеше оставалось не больше hash-max-listpack-entries (128) полей:
+    тогда Redis хранит его одним listpack без накладных расходов на ключ и
+    запись словаря для каждого jti. Проверка знает exp из токена, поэтому
+    это один HEXISTS, а с legacy_fallback еще два запроса в том же
+    пайплайне.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        bucket_seconds: int,
+        shards: int,
+        legacy_fallback: bool,
+    ) -> None:
+        self.prefix = prefix
+        self.bucket_seconds = bucket_seconds
+        self.shards = shards
+        self.legacy_fallback = legacy_fallback
+
+    def key(self, raw: bytes, bucket: int | str) -> str:
+        shard = int.from_bytes(raw[-2:], "big") % self.shards
+        return "%s:%s:%d" % (self.prefix, bucket, shard)
+
+    def bucket_key(self, raw: bytes, exp: float) -> str:
+        return self.key(raw, int(exp) // self.bucket_seconds)
+
+    def bucket_expires_at(self, exp: float) -> int:
+        return (int(exp) // self.bucket_seconds + 1) * self.bucket_seconds
+
+    @property
+    def lookup_size(self) -> int:
+        """Сколько ответов пайплайна занимает одна проверка."""
+        return 3 if self.legacy_fallback else 1
+
+    def queue_add(self, pipe: Pipeline, jti: str, exp: float) -> None:
+        raw = jti_bytes(jti)
+        key = self.bucket_key(raw, exp)
+        pipe.hset(key, raw, 1)
+        pipe.expireat(key, self.bucket_expires_at(exp))
+
+    def queue_lookup(self, pipe: Pipeline, jti: str, exp: float) -> None:
+        raw = jti_bytes(jti)
+        pipe.hexists(self.bucket_key(raw, exp), raw)
+        if self.legacy_fallback:
+            pipe.hexists(self.key(raw, LEGACY_BUCKET), raw)
+            pipe.exists(BLACKLIST_KEY % jti)
+
+    async def _hkeys(self, redis: Redis, keys: list[str]) -> list[list[bytes]]:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.execute_command("HKEYS", key, NEVER_DECODE=True)
+            return await pipe.execute()
+
+    async def scan(self, redis: Redis) -> AsyncIterator[bytes]:
+        """Все отозванные jti в 16-байтовом виде, включая прежний формат."""
+        keys = []
+        async for key in redis.scan_iter(match="%s:*" % self.prefix, count=1000):
+            keys.append(key)
+            if len(keys) >= _SCAN_BATCH:
+                for fields in await self._hkeys(redis, keys):
+                    for raw in fields:
+                        yield raw
+                keys = []
+        for fields in await self._hkeys(redis, keys):
+            for raw in fields:
+                yield raw
+        if self.legacy_fallback:
+            prefix_len = len(BLACKLIST_KEY % "")
+            async for key in redis.scan_iter(match=BLACKLIST_KEY % "*", count=1000):
+                yield jti_bytes(key[prefix_len:])
+
+
+revocation_store = RevocationStore(
+    prefix="revoked",
+    bucket_seconds=settings.security.revocation_store.bucket_seconds,
+    shards=settings.security.revocation_store.shards,
+    legacy_fallback=settings.security.revocation_store.legacy_fallback,
+)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: bytes):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: bytes) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationFilter:
+    """Локальный фильтр отозванных jti, чтобы не ходить в Redis на каждый
+    запрос с неотозванным токеном.
+
+    Фильтр Блума строится сканированием хранилища и дополняется событиями
+    из канала REVOCATION_CHANNEL; отзывы, пришедшие с начала последней
+    перестройки, хранятся еще и точно.
+    В Redis идем только при срабатывании фильтра или если фильтр устарел:
+    нет подписки или он не перестраивался дольше rebuild_interval.
+    Емкость фильтра берется с запасом от числа отзывов в хранилище, чтобы
+    доля ложных срабатываний, а с ней и походов в Redis, не росла вместе
+    с числом сессий.
+    """
+
+    def __init__(
+        self,
+        store: RevocationStore,
+        enabled: bool,
+        capacity: int,
+        error_rate: float,
+        rebuild_interval: float,
+    ) -> None:
+        self.store = store
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._entries = 0
+        self._recent: dict[str, float] = {}
+        self._subscribed = False
+        self._synced_at: float | None = None
+        self._rebuild_task: asyncio.Task | None = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return (
+            self._subscribed
+            and self._synced_at is not None
+            and time.monotonic() - self._synced_at < self.rebuild_interval
+        )
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self._recent[jti] = expires_at
+        self._bloom.add(jti_bytes(jti))
+        REVOCATION_FILTER_ENTRIES.inc()
+
+    def handle_event(self, data: str) -> None:
+        jti, expires_at = data.split(" ", 1)
+        self.add(jti, float(expires_at))
+        token_cache.evict_jti(jti)
+
+    def mark_stale(self) -> None:
+        self._subscribed = False
+
+    async def rebuild(self, redis: Redis) -> None:
+        self._subscribed = True
+        if not self.enabled:
+            return
+        # прежние точные записи уже лежат в Redis и попадут в новый фильтр
+        # при сканировании; сохранять нужно только пришедшие во время него
+        self._recent = {}
+        capacity = max(self.capacity, self._entries * 2)
+        bloom, entries = await self._scan(redis, capacity)
+        if entries > capacity:
+            logger.warning(
+                "Revocation filter sized for %d entries found %d, rescanning"
+                % (capacity, entries)
+            )
+            capacity = entries * 2
+            bloom, entries = await self._scan(redis, capacity)
+
+        for jti in self._recent:
+            bloom.add(jti_bytes(jti))
+        self._bloom = bloom
+        self._entries = entries
+        self._synced_at = time.monotonic()
+        REVOCATION_FILTER_ENTRIES.set(entries + len(self._recent))
+        REVOCATION_FILTER_CAPACITY.set(capacity)
+        logger.info(
+            "Revocation filter rebuilt: %d entries, capacity %d" % (entries, capacity)
+        )
+
+    async def _scan(self, redis: Redis, capacity: int) -> tuple[BloomFilter, int]:
+        bloom = BloomFilter(capacity, self.error_rate)
+        entries = 0
+        async for raw in self.store.scan(redis):
+            bloom.add(raw)
+            entries += 1
+        return bloom, entries
+
+    def _schedule_rebuild(self, redis: Redis) -> None:
+        if self._subscribed and (
+            self._rebuild_task is None or self._rebuild_task.done()
+        ):
+            self._rebuild_task = asyncio.create_task(self.rebuild(redis))
+
+    def check_local(self, jti: str) -> bool | None:
+        """Ответ без Redis, если он возможен; None - нужна проверка в Redis."""
+        if not self.enabled:
+            return None
+        if not self.is_fresh:
+            self._schedule_rebuild(redis_helper.client)
+            return None
+        if self._recent.get(jti, 0) > time.time():
+            return True
+        if jti_bytes(jti) not in self._bloom:
+            return False
+        return None
+
+    async def is_revoked(self, redis: Redis, jti: str, exp: float) -> bool:
+        revoked = self.check_local(jti)
+        if revoked is not None:
+            return revoked
+        async with redis.pipeline(transaction=False) as pipe:
+            self.store.queue_lookup(pipe, jti, exp)
+            with observe(REDIS_COMMAND_SECONDS, "blacklist_lookup"):
+                return any(await pipe.execute())
+
+
+revocation_filter = RevocationFilter(
+    store=revocation_store,
+    enabled=settings.security.revocation_filter.enabled,
+    capacity=settings.security.revocation_filter.capacity,
+    error_rate=settings.security.revocation_filter.error_rate,
+    rebuild_interval=settings.security.revocation_filter.rebuild_interval_seconds,
+)
+event_bus.subscribe(REVOCATION_CHANNEL, revocation_filter.handle_event)
+event_bus.on_connect(revocation_filter.rebuild)
+event_bus.on_disconnect(revocation_filter.mark_stale)
+
+
+async def revoke(
+    redis: Redis,
+    *revocations: tuple[str, float],
+    family: tuple[str, int] | None = None,
+) -> None:
+    """Отзывает jti: (jti, exp токена) за один round trip в Redis.
+
+    family - (id семейства refresh-токенов, ttl), если нужно отозвать и его.
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for jti, exp in revocations:
+            revocation_store.queue_add(pipe, jti, exp)
+            pipe.publish(REVOCATION_CHANNEL, "%s %d" % (jti, exp))
+        if family is not None:
+            family_id, ttl = family
+            pipe.set(REFRESH_FAMILY_KEY % family_id, FAMILY_REVOKED, ex=ttl)
+        with observe(REDIS_COMMAND_SECONDS, "revoke"):
+            await pipe.execute()
+    for jti, exp in revocations:
+        revocation_filter.add(jti, exp)
+        token_cache.evict_jti(jti)
+
+
+async def is_revoked(redis: Redis, jti: str, exp: float) -> bool:
+    return await revocation_filter.is_revoked(redis, jti, exp)
+
+
+class RotationResult(IntEnum):
+    REUSED = -1
+    REVOKED = 0
+    ROTATED = 1
+
+
+# KEYS: бакет old_jti, refresh_family:<family>
+#       [, шард legacy и blacklist:<old_jti>, если включен legacy_fallback]
+# ARGV: old_jti, new_jti, ttl, exp old_jti, канал событий, маркер отзыва,
+#       16-байтовый old_jti, время истечения бакета
+_ROTATE_REFRESH_LUA = """
+local current = redis.call('GET', KEYS[2])
+if current == ARGV[6] then
+    return 0
+end
+if current and current ~= ARGV[1] then
+    redis.call('SET', KEYS[2], ARGV[6], 'EX', ARGV[3])
+    return -1
+end
+if redis.call('HEXISTS', KEYS[1], ARGV[7]) == 1 then
+    return 0
+end
+if KEYS[3] and (redis.call('HEXISTS', KEYS[3], ARGV[7]) == 1
+        or redis.call('EXISTS', KEYS[4]) == 1) then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[7], 1)
+redis.call('EXPIREAT', KEYS[1], ARGV[8])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('PUBLISH', ARGV[5], ARGV[1] .. ' ' .. ARGV[4])
+return 1
+"""
+_rotate_refresh_script = redis_helper.client.register_script(_ROTATE_REFRESH_LUA)
+
+
+async def rotate_refresh_token(
+    redis: Redis,
+    family: str,
+    old_jti: str,
+    old_exp: float,
+    new_jti: str,
+    ttl: int,
+) -> RotationResult:
+    """Атомарно отзывает старый refresh-токен и делает new_jti текущим
+    в семействе. Повторное предъявление уже замененного токена отзывает
+    все семейство."""
+    raw = jti_bytes(old_jti)
+    keys = [revocation_store.bucket_key(raw, old_exp), REFRESH_FAMILY_KEY % family]
+    if revocation_store.legacy_fallback:
+        keys += [revocation_store.key(raw, LEGACY_BUCKET), BLACKLIST_KEY % old_jti]
+    with observe(REDIS_COMMAND_SECONDS, "rotate_refresh"):
+        result = RotationResult(
+            await _rotate_refresh_script(
+                keys=keys,
+                args=[
+                    old_jti,
+                    new_jti,
+                    ttl,
+                    "%d" % old_exp,
+                    REVOCATION_CHANNEL,
+                    FAMILY_REVOKED,
+                    raw,
+                    revocation_store.bucket_expires_at(old_exp),
+                ],
+                client=redis,
+            )
+        )
+    if result == RotationResult.ROTATED:
+        revocation_filter.add(old_jti, old_exp)
+        token_cache.evict_jti(old_jti)
+    return result
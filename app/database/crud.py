@@ -1,43 +1,179 @@
-from sqlalchemy import select, update
+import uuid
+from enum import IntEnum
+
+from sqlalchemy import Row, bindparam, func, select, true, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import hash_password, validate_password
+from app.core.metrics import DB_QUERY_SECONDS, observe
+from app.core.security import hash_password, needs_rehash, validate_password
 from app.models import User
-from app.schemas import UserCreate
+from app.schemas import UserCreate, UserState
+
+# Запросы собираются один раз: SQLAlchemy берет скомпилированный SQL из
+# кэша, а asyncpg переиспользует подготовленный на соединении statement.
+# Поиск идет по lower(email), что совпадает с индексом ix_users_email_lower.
+_email_matches = func.lower(User.email) == bindparam("email")
+
+USER_STATE_STMT = select(
+    User.id, User.email, User.role, User.is_active, User.is_verified
+).where(_email_matches)
+
+USER_STATES_STMT = select(
+    User.id, User.email, User.role, User.is_active, User.is_verified
+).where(func.lower(User.email).in_(bindparam("emails", expanding=True)))
+
+USER_CREDENTIALS_STMT = select(
+    User.id, User.email, User.password, User.role, User.is_active, User.is_verified
+).where(_email_matches)
+
+
+class VerifyResult(IntEnum):
+    NOT_FOUND = 0
+    INACTIVE = 1
+    ALREADY_VERIFIED = 2
+    VERIFIED = 3
 
 
-async def create_user(session: AsyncSession, user_create: UserCreate) -> User:
+# Строка блокируется в target, поэтому параллельная верификация дождется
+# первой и увидит is_verified = true, а не обновит строку повторно.
+_verify_target = (
+    select(User.id, User.is_active, User.is_verified)
+    .where(_email_matches)
+    .with_for_update()
+    .cte("target")
+)
+_verify_updated = (
+    update(User)
+    .where(
+        User.id == _verify_target.c.id,
+        _verify_target.c.is_active,
+        _verify_target.c.is_verified.is_(False),
+    )
+    .values(is_verified=True)
+    .returning(User.id)
+    .cte("updated")
+)
+VERIFY_USER_STMT = select(
+    _verify_target.c.is_active,
+    _verify_target.c.is_verified,
+    _verify_updated.c.id.is_not(None).label("updated"),
+).select_from(_verify_target.outerjoin(_verify_updated, true()))
+
+
+async def create_user(
+    session: AsyncSession, user_create: UserCreate
+) -> UserState | None:
+    """Возвращает None, если пользователь с таким email уже есть."""
     params = user_create.model_dump()
-    params["password"] = hash_password(params["password"])
-    user = User(**params)
+    params["password"] = await hash_password(params["password"])
+    stmt = (
+        insert(User)
+        .values(**params)
+        .on_conflict_do_nothing()
+        .returning(User.id, User.email, User.role, User.is_active, User.is_verified)
+    )
+    with observe(DB_QUERY_SECONDS, "create_user"):
+        row = (await session.execute(stmt)).one_or_none()
+        await session.commit()
+    return UserState.model_validate(row) if row else None
+
 
-    session.add(user)
-    await session.commit()
-    return user
+async def get_user_state(session: AsyncSession, email: str) -> UserState | None:
+    with observe(DB_QUERY_SECONDS, "get_user_state"):
+        result = await session.execute(USER_STATE_STMT, {"email": email.lower()})
+    row = result.one_or_none()
+    return UserState.model_validate(row) if row else None
 
 
-async def get_user_by_email(session: AsyncSession, email: str) -> User | None:
-    stmt = select(User).where(User.email == email)
-    user = await session.execute(stmt)
-    return user.scalar_one_or_none()
+async def get_user_states(
+    session: AsyncSession, emails: list[str]
+) -> dict[str, UserState]:
+    """Состояния пользователей одним запросом, ключ - email в нижнем регистре."""
+    with observe(DB_QUERY_SECONDS, "get_user_states"):
+        result = await session.execute(
+            USER_STATES_STMT, {"emails": [email.lower() for email in emails]}
+        )
+    return {row.email.lower(): UserState.model_validate(row) for row in result.all()}
+
 
+async def get_user_credentials(session: AsyncSession, email: str) -> Row | None:
+    with observe(DB_QUERY_SECONDS, "get_user_credentials"):
+        result = await session.execute(USER_CREDENTIALS_STMT, {"email": email.lower()})
+    return result.one_or_none()
 
-async def authenticate(session: AsyncSession, email: str, password: str) -> User | None:
-    user = await get_user_by_email(session=session, email=email)
+
+async def authenticate(
+    session: AsyncSession,
+    email: str,
+    password: str,
+    primary: AsyncSession | None = None,
+) -> UserState | None:
+    """session может смотреть на реплику; тогда primary - сессия основного
+    сервера: на ней перепроверяется не найденный email (только что
+    зарегистрированный пользователь мог еще не доехать до реплики) и
+    сохраняется перехешированный пароль."""
+    user = await get_user_credentials(session=session, email=email)
+    if not user and primary is not None:
+        user = await get_user_credentials(session=primary, email=email)
     if not user:
         return None
-    if not validate_password(password, user.password):
+    if not await validate_password(password, user.password):
         return None
-    return user
+    if needs_rehash(user.password):
+        await rehash_password(primary or session, user.id, user.password, password)
+    return UserState.model_validate(user)
+
+
+async def rehash_password(
+    session: AsyncSession, user_id: uuid.UUID, old_hash: bytes, password: str
+) -> None:
+    """Перехеширует пароль текущими параметрами после успешного входа.
+
+    Условие на старый хеш не дает затереть пароль, измененный
+    параллельно.
+    """
+    new_hash = await hash_password(password)
+    stmt = (
+        update(User)
+        .where(User.id == user_id, User.password == old_hash)
+        .values(password=new_hash)
+    )
+    with observe(DB_QUERY_SECONDS, "rehash_password"):
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def verify_user(session: AsyncSession, email: str) -> VerifyResult:
+    with observe(DB_QUERY_SECONDS, "verify_user"):
+        result = await session.execute(VERIFY_USER_STMT, {"email": email.lower()})
+        row = result.one_or_none()
+        await session.commit()
+    if row is None:
+        return VerifyResult.NOT_FOUND
+    if row.updated:
+        return VerifyResult.VERIFIED
+    if not row.is_active:
+        return VerifyResult.INACTIVE
+    return VerifyResult.ALREADY_VERIFIED
+
+
+async def user_exists(session: AsyncSession, user_id: uuid.UUID) -> bool:
+    stmt = select(User.id).where(User.id == user_id)
+    with observe(DB_QUERY_SECONDS, "user_exists"):
+        return (await session.execute(stmt)).scalar_one_or_none() is not None
 
 
-async def verify_user(session: AsyncSession, email: str) -> None:
+async def deactivate_user(session: AsyncSession, user_id: uuid.UUID) -> str | None:
     stmt = (
         update(User)
-        .where(User.email == email)
+        .where(User.id == user_id)
         .values(
-            is_verified=True,
+            is_active=False,
         )
+        .returning(User.email)
     )
-    await session.execute(stmt)
-    await session.commit()
+    with observe(DB_QUERY_SECONDS, "deactivate_user"):
+        email = (await session.execute(stmt)).scalar_one_or_none()
+        await session.commit()
+    return email
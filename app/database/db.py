@@ -1,31 +1,103 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+from functools import cached_property
+from typing import AsyncGenerator, Sequence
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_READ_SESSIONS,
+    DB_REPLICA_LAG_SECONDS,
+    observe,
+)
 from app.database import crud
-from app.models.user import User
 from app.schemas import AdminCreate
 
+logger = logging.getLogger(__name__)
+
+# Равенство receive и replay LSN значит "проиграно все полученное", а не
+# "догнали основной": без работающего WAL receiver реплика перестает
+# получать WAL и отстает сколько угодно, поэтому он проверяется отдельно
+REPLICA_STATUS_QUERY = text(
+    "SELECT pg_is_in_recovery() AS in_recovery, "
+    "EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') "
+    "AS streaming, "
+    "CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END AS lag"
+)
+
+
+class ReplicaUnavailable(Exception):
+    pass
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        with observe(DB_POOL_CHECKOUT_SECONDS):
+            return super()._do_get()
+
 
 class DatabaseHelper:
+    """Engine и фабрика сессий создаются при первом обращении: импорт
+    модуля не тянет диалект asyncpg и не требует доступной базы.
+
+    Реплики - такие же DatabaseHelper без своих реплик. get_read_session
+    раздает сессии по репликам, прошедшим последнюю проверку отставания,
+    по кругу, а если таких нет - открывает сессию на основном сервере.
+    """
+
     def __init__(
         self,
         url: str,
         pool_size: int,
         max_overflow: int,
         echo: bool = False,
+        replica_urls: Sequence[str] = (),
+        replica_max_lag: float = 1.0,
+        replica_check_interval: float = 1.0,
     ) -> None:
+        self.url = url
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.echo = echo
+        self.replica_max_lag = replica_max_lag
+        self.replica_check_interval = replica_check_interval
+        self.replicas = [
+            DatabaseHelper(replica_url, pool_size, max_overflow, echo)
+            for replica_url in replica_urls
+        ]
+        self._healthy_replicas: list[DatabaseHelper] = []
+        self._next_replica = itertools.count()
+
+    @property
+    def name(self) -> str:
+        url = make_url(self.url)
+        return "%s:%s" % (url.host, url.port or 5432)
 
-        self.engine = create_async_engine(
-            url=url,
-            echo=echo,
-            pool_size=pool_size,
-            max_overflow=max_overflow,
+    @cached_property
+    def engine(self) -> AsyncEngine:
+        return create_async_engine(
+            url=self.url,
+            echo=self.echo,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            poolclass=TimedQueuePool,
         )
 
-        self.session_factory = async_sessionmaker(
+    @cached_property
+    def session_factory(self) -> async_sessionmaker[AsyncSession]:
+        return async_sessionmaker(
             bind=self.engine,
             expire_on_commit=False,
             autoflush=False,
@@ -36,13 +108,94 @@ class DatabaseHelper:
         async with self.session_factory() as session:
             yield session
 
+    async def get_read_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """Сессия только для чтения; данные могут отставать от основного
+        сервера не больше чем на replica_max_lag + replica_check_interval."""
+        healthy = self._healthy_replicas
+        if healthy:
+            target = healthy[next(self._next_replica) % len(healthy)]
+            DB_READ_SESSIONS.labels("replica").inc()
+        else:
+            target = self
+            DB_READ_SESSIONS.labels("primary").inc()
+        async with target.session_factory() as session:
+            yield session
+
+    async def replica_lag(self) -> float:
+        async with self.engine.connect() as connection:
+            status = (await connection.execute(REPLICA_STATUS_QUERY)).one()
+        if not status.in_recovery:
+            raise ReplicaUnavailable("server is not in recovery")
+        if not status.streaming:
+            raise ReplicaUnavailable("WAL receiver is not streaming")
+        if status.lag is None:
+            raise ReplicaUnavailable("nothing replayed yet")
+        return float(status.lag)
+
+    async def check_replicas(self) -> None:
+        lags = await asyncio.gather(
+            *(
+                asyncio.wait_for(replica.replica_lag(), self.replica_check_interval)
+                for replica in self.replicas
+            ),
+            return_exceptions=True,
+        )
+        healthy = []
+        for replica, lag in zip(self.replicas, lags):
+            if isinstance(lag, ReplicaUnavailable):
+                reason = str(lag)
+            elif isinstance(lag, BaseException):
+                reason = "check failed: %r" % lag
+            elif lag > self.replica_max_lag:
+                reason = "lag %.1f s" % lag
+            else:
+                healthy.append(replica)
+                reason = None
+            DB_REPLICA_LAG_SECONDS.labels(replica.name).set(
+                lag if isinstance(lag, float) else -1
+            )
+            was_healthy = replica in self._healthy_replicas
+            if reason is not None and was_healthy:
+                logger.warning("Replica %s disabled: %s" % (replica.name, reason))
+            elif reason is None and not was_healthy:
+                logger.info("Replica %s enabled" % replica.name)
+        self._healthy_replicas = healthy
+
+    async def monitor_replicas_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.replica_check_interval)
+            await self.check_replicas()
+
+    async def warm_up(self, connections: int) -> None:
+        """Открывает соединения заранее, чтобы первые запросы не платили
+        за TCP, TLS и авторизацию. Соединения возвращаются в пул.
+        Недоступная реплика не мешает старту, чтения идут на основной."""
+        connections = min(connections, self.engine.pool.size())
+        opened = await asyncio.gather(
+            *(self.engine.connect() for _ in range(connections))
+        )
+        for connection in opened:
+            await connection.execute(text("SELECT 1"))
+            await connection.close()
+        if not self.replicas:
+            return
+        results = await asyncio.gather(
+            *(replica.warm_up(connections) for replica in self.replicas),
+            return_exceptions=True,
+        )
+        for replica, result in zip(self.replicas, results):
+            if isinstance(result, Exception):
+                logger.warning("Replica %s warm up failed: %r" % (replica.name, result))
+        await self.check_replicas()
+
+    async def dispose(self) -> None:
+        await asyncio.gather(
+            self.engine.dispose(), *(replica.dispose() for replica in self.replicas)
+        )
+
     async def init_db(self):
         async for session in self.get_session():
-            user = (
-                await session.execute(
-                    select(User).where(User.email == settings.first_admin)
-                )
-            ).first()
+            user = await crud.get_user_state(session, settings.first_admin)
             if not user:
                 user_in = AdminCreate(
                     email=settings.first_admin,
@@ -56,4 +209,7 @@ db_helper = DatabaseHelper(
     pool_size=settings.postgres.pool_size,
     max_overflow=settings.postgres.max_overflow,
     echo=settings.postgres.echo,
+    replica_urls=settings.postgres.replica_urls,
+    replica_max_lag=settings.postgres.replica_max_lag_seconds,
+    replica_check_interval=settings.postgres.replica_check_interval_seconds,
 )
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.database.redis_db import RedisHelper, redis_helper
+
+logger = logging.getLogger(__name__)
+
+
+class RedisEventBus:
+    """Фоновая подписка воркера на каналы Redis pub/sub.
+
+    После каждого (пере)подключения вызываются on_connect-колбэки, чтобы
+    локальные структуры могли заново синхронизироваться с Redis; при
+    потере соединения - on_disconnect, чтобы пометить их устаревшими.
+    """
+
+    def __init__(self, helper: RedisHelper, reconnect_delay: float = 1.0) -> None:
+        self.helper = helper
+        self.reconnect_delay = reconnect_delay
+        self._handlers: dict[str, Callable[[str], None]] = {}
+        self._connect_callbacks: list[Callable[[Redis], Awaitable[None]]] = []
+        self._disconnect_callbacks: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        self._handlers[channel] = handler
+
+    def on_connect(self, callback: Callable[[Redis], Awaitable[None]]) -> None:
+        self._connect_callbacks.append(callback)
+
+    def on_disconnect(self, callback: Callable[[], None]) -> None:
+        self._disconnect_callbacks.append(callback)
+
+    def start(self) -> None:
+        if self._task is None and self._handlers:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        client = self.helper.client
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(*self._handlers)
+            for callback in self._connect_callbacks:
+                await callback(client)
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=None
+                )
+                if message is None:
+                    continue
+                handler = self._handlers.get(message["channel"])
+                if handler is not None:
+                    handler(message["data"])
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except (RedisError, OSError) as e:
+                logger.warning("Redis event bus disconnected: %s" % e)
+                for callback in self._disconnect_callbacks:
+                    callback()
+                await asyncio.sleep(self.reconnect_delay)
+
+
+event_bus = RedisEventBus(helper=redis_helper)
@@ -0,0 +1,171 @@
+import math
+import time
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS, observe
+from app.database.redis_db import redis_helper
+
+LOGIN_WINDOW_KEY = "login_attempts:%s:%s"
+LOGIN_LOCK_KEY = "login_lock:%s:%s"
+LOGIN_STRIKES_KEY = "login_strikes:%s:%s"
+
+# KEYS: окно ip, окно аккаунта, блокировка ip, блокировка аккаунта
+# ARGV: now (мс), окно (мс), лимит ip, лимит аккаунта, id попытки
+# Возвращает 0, если попытка занесена в оба окна, иначе Retry-After в мс
+_LOGIN_RESERVE_LUA = """
+local locked = math.max(redis.call('PTTL', KEYS[3]), redis.call('PTTL', KEYS[4]))
+if locked > 0 then
+    return locked
+end
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limits = {tonumber(ARGV[3]), tonumber(ARGV[4])}
+for i = 1, 2 do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, now - window)
+    if redis.call('ZCARD', KEYS[i]) >= limits[i] then
+        local oldest = redis.call('ZRANGE', KEYS[i], 0, 0, 'WITHSCORES')
+        return math.max(1, tonumber(oldest[2]) + window - now)
+    end
+end
+for i = 1, 2 do
+    redis.call('ZADD', KEYS[i], now, ARGV[5])
+    redis.call('PEXPIRE', KEYS[i], window)
+end
+return 0
+"""
+_login_reserve_script = redis_helper.client.register_script(_LOGIN_RESERVE_LUA)
+
+# KEYS: окно ip, окно аккаунта, блокировка ip, блокировка аккаунта,
+#       счетчик блокировок ip, счетчик блокировок аккаунта
+# ARGV: лимит ip, лимит аккаунта, базовая блокировка (с),
+#       максимальная блокировка (с), ttl счетчиков блокировок (с)
+_LOGIN_FAILURE_LUA = """
+local limits = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+for i = 1, 2 do
+    if redis.call('ZCARD', KEYS[i]) >= limits[i] then
+        local strikes = redis.call('INCR', KEYS[i + 4])
+        redis.call('EXPIRE', KEYS[i + 4], ARGV[5])
+        local lock = math.min(
+            tonumber(ARGV[3]) * 2 ^ (strikes - 1), tonumber(ARGV[4])
+        )
+        redis.call('SET', KEYS[i + 2], 1, 'PX', math.floor(lock * 1000))
+        redis.call('DEL', KEYS[i])
+    end
+end
+return 0
+"""
+_login_failure_script = redis_helper.client.register_script(_LOGIN_FAILURE_LUA)
+
+
+def _window_keys(ip: str, account: str) -> list[str]:
+    return [LOGIN_WINDOW_KEY % ("ip", ip), LOGIN_WINDOW_KEY % ("account", account)]
+
+
+def _lock_keys(ip: str, account: str) -> list[str]:
+    return [LOGIN_LOCK_KEY % ("ip", ip), LOGIN_LOCK_KEY % ("account", account)]
+
+
+class LoginThrottle:
+    """Скользящие окна попыток входа по IP и по аккаунту в Redis.
+
+    check() до bcrypt одним Lua-скриптом проверяет блокировки и заносит
+    попытку в оба окна, если в них есть место; параллельные подборы одного
+    пароля поэтому упираются в лимит до хеширования, а не после. Исход
+    попытки решает, останется ли она в окнах: record_failure() оставляет
+    ее и, если окно заполнено, блокирует ключ на lockout_base * 2^(n-1)
+    секунд, где n - номер блокировки за последние lockout_max секунд;
+    record_success() убирает ее из окна IP и очищает окно аккаунта, а
+    release() убирает попытку, которая не дошла до проверки пароля. Частые
+    входы с верным паролем поэтому к блокировке не ведут.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        window: int,
+        ip_limit: int,
+        account_limit: int,
+        lockout_base: int,
+        lockout_max: int,
+    ) -> None:
+        self.enabled = enabled
+        self.window = window
+        self.ip_limit = ip_limit
+        self.account_limit = account_limit
+        self.lockout_base = lockout_base
+        self.lockout_max = lockout_max
+
+    async def check(self, redis: Redis, ip: str, account: str, attempt: str) -> int:
+        """Возвращает 0, если попытка attempt занесена в окна и ее можно
+        выполнить, иначе Retry-After в секундах."""
+        if not self.enabled:
+            return 0
+        account = account.lower()
+        with observe(REDIS_COMMAND_SECONDS, "login_throttle"):
+            retry_after = await _login_reserve_script(
+                keys=_window_keys(ip, account) + _lock_keys(ip, account),
+                args=[
+                    int(time.time() * 1000),
+                    self.window * 1000,
+                    self.ip_limit,
+                    self.account_limit,
+                    attempt,
+                ],
+                client=redis,
+            )
+        return math.ceil(retry_after / 1000)
+
+    async def record_failure(self, redis: Redis, ip: str, account: str) -> None:
+        if not self.enabled:
+            return
+        account = account.lower()
+        with observe(REDIS_COMMAND_SECONDS, "login_throttle"):
+            await _login_failure_script(
+                keys=_window_keys(ip, account)
+                + _lock_keys(ip, account)
+                + [
+                    LOGIN_STRIKES_KEY % ("ip", ip),
+                    LOGIN_STRIKES_KEY % ("account", account),
+                ],
+                args=[
+                    self.ip_limit,
+                    self.account_limit,
+                    self.lockout_base,
+                    self.lockout_max,
+                    self.lockout_max,
+                ],
+                client=redis,
+            )
+
+    async def record_success(
+        self, redis: Redis, ip: str, account: str, attempt: str
+    ) -> None:
+        if not self.enabled:
+            return
+        ip_window, account_window = _window_keys(ip, account.lower())
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(ip_window, attempt)
+            pipe.delete(account_window)
+            with observe(REDIS_COMMAND_SECONDS, "login_throttle"):
+                await pipe.execute()
+
+    async def release(self, redis: Redis, ip: str, account: str, attempt: str) -> None:
+        if not self.enabled:
+            return
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in _window_keys(ip, account.lower()):
+                pipe.zrem(key, attempt)
+            with observe(REDIS_COMMAND_SECONDS, "login_throttle"):
+                await pipe.execute()
+
+
+login_throttle = LoginThrottle(
+    enabled=settings.security.login_throttle.enabled,
+    window=settings.security.login_throttle.window_seconds,
+    ip_limit=settings.security.login_throttle.max_attempts_per_ip,
+    account_limit=settings.security.login_throttle.max_attempts_per_account,
+    lockout_base=settings.security.login_throttle.lockout_base_seconds,
+    lockout_max=settings.security.login_throttle.lockout_max_seconds,
+)
@@ -1,3 +1,4 @@
+import asyncio
 from typing import AsyncGenerator
 
 from redis.asyncio import ConnectionPool, Redis
@@ -18,10 +19,27 @@ class RedisHelper:
             decode_responses=decode_responses,
         )
 
+    @property
+    def client(self) -> Redis:
+        # Redis.from_pool закрывает весь пул при закрытии клиента,
+        # поэтому клиенты только пользуются общим пулом
+        return Redis(connection_pool=self.pool)
+
     async def get_client(self) -> AsyncGenerator[Redis, None]:
-        async with Redis.from_pool(self.pool) as client:
+        async with self.client as client:
             yield client
 
+    async def warm_up(self, connections: int) -> None:
+        connections = min(connections, self.pool.max_connections)
+        opened = await asyncio.gather(
+            *(self.pool.get_connection("PING") for _ in range(connections))
+        )
+        for connection in opened:
+            await self.pool.release(connection)
+
+    async def close(self) -> None:
+        await self.pool.aclose()
+
 
 redis_helper = RedisHelper(
     url=str(settings.redis.get_uri),
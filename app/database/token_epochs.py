@@ -0,0 +1,79 @@
+import logging
+
+from redis.asyncio import Redis
+
+from app.core.metrics import REDIS_COMMAND_SECONDS, observe
+from app.core.security import PAYLOAD_KEY_EPOCH, PAYLOAD_KEY_USER_ID
+from app.database.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+TOKEN_EPOCH_KEY = "token_epoch:%s"
+TOKEN_EPOCH_CHANNEL = "token_epoch:events"
+
+
+class TokenEpochs:
+    """Поколения токенов пользователей для отзыва всех сессий сразу.
+
+    Номер поколения вшивается в токен при выпуске, а увеличение счетчика
+    в Redis делает недействительными все токены пользователя со старым
+    номером - без записей на каждый jti. Воркер держит локальную копию
+    ненулевых счетчиков, синхронизируемую через event bus, и без подписки
+    читает счетчик из Redis.
+    """
+
+    def __init__(self) -> None:
+        self._epochs: dict[str, int] = {}
+        self._synced = False
+
+    async def rebuild(self, redis: Redis) -> None:
+        epochs: dict[str, int] = {}
+        prefix_len = len(TOKEN_EPOCH_KEY % "")
+        keys = [
+            key
+            async for key in redis.scan_iter(match=TOKEN_EPOCH_KEY % "*", count=1000)
+        ]
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start : start + 1000]
+            for key, value in zip(chunk, await redis.mget(chunk)):
+                if value is not None:
+                    epochs[key[prefix_len:]] = int(value)
+        self._epochs = epochs
+        self._synced = True
+        logger.info("Token epochs synced: %d users" % len(epochs))
+
+    def mark_stale(self) -> None:
+        self._synced = False
+
+    def handle_event(self, data: str) -> None:
+        user_id, epoch = data.split(" ", 1)
+        self._epochs[user_id] = max(self._epochs.get(user_id, 0), int(epoch))
+
+    def local(self, user_id: str) -> int | None:
+        """Поколение из локальной копии; None, если копия не синхронизирована."""
+        if self._synced:
+            return self._epochs.get(user_id, 0)
+        return None
+
+    async def current(self, redis: Redis, user_id: str) -> int:
+        epoch = self.local(user_id)
+        if epoch is not None:
+            return epoch
+        with observe(REDIS_COMMAND_SECONDS, "epoch_lookup"):
+            return int(await redis.get(TOKEN_EPOCH_KEY % user_id) or 0)
+
+    async def bump(self, redis: Redis, user_id: str) -> int:
+        epoch = await redis.incr(TOKEN_EPOCH_KEY % user_id)
+        await redis.publish(TOKEN_EPOCH_CHANNEL, "%s %d" % (user_id, epoch))
+        self.handle_event("%s %d" % (user_id, epoch))
+        return epoch
+
+    async def is_outdated(self, redis: Redis, payload: dict) -> bool:
+        current = await self.current(redis, payload[PAYLOAD_KEY_USER_ID])
+        return payload.get(PAYLOAD_KEY_EPOCH, 0) < current
+
+
+token_epochs = TokenEpochs()
+event_bus.subscribe(TOKEN_EPOCH_CHANNEL, token_epochs.handle_event)
+event_bus.on_connect(token_epochs.rebuild)
+event_bus.on_disconnect(token_epochs.mark_stale)
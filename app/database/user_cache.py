@@ -0,0 +1,157 @@
+import time
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS, observe
+from app.database import crud
+from app.database.events import event_bus
+from app.database.redis_db import redis_helper
+from app.schemas import UserState
+
+USER_STATE_KEY = "user_state:%s"
+USER_STATE_TOMBSTONE_KEY = "user_state_tombstone:%s"
+USER_STATE_CHANNEL = "user_state:invalidate"
+
+# KEYS: user_state:<email>, user_state_tombstone:<email>
+# ARGV: состояние в JSON, ttl в секундах
+_FILL_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+_fill_script = redis_helper.client.register_script(_FILL_LUA)
+
+
+class UserStateCache:
+    """Двухуровневый кэш состояния пользователя для get_current_user.
+
+    Сначала локальный TTL-кэш воркера, затем общий кэш в Redis, и только
+    потом Postgres. invalidate() удаляет запись из Redis и рассылает событие,
+    по которому все воркеры сбрасывают локальную копию. Пока подписка на
+    события не работает, локальный уровень не используется.
+
+    Чтение из базы, начатое до изменения, может закончиться после
+    invalidate() и вернуть старое состояние. Поэтому invalidate() оставляет
+    надгробие на tombstone_seconds, и заполнение кэша (Lua-скрипт) при нем
+    ничего не пишет.
+
+    Промах может читаться и с реплики, отстающей не больше чем на
+    replica_staleness, поэтому надгробие живет дольше на это время.
+    """
+
+    def __init__(
+        self,
+        local_ttl: float,
+        redis_ttl: int,
+        max_size: int,
+        tombstone_ttl: float,
+        replica_staleness: float = 0,
+    ) -> None:
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.max_size = max_size
+        self.tombstone_ttl = tombstone_ttl
+        self.replica_staleness = replica_staleness
+        self._local: OrderedDict[str, tuple[UserState, float]] = OrderedDict()
+        self._subscribed = False
+
+    def get_local(self, email: str) -> UserState | None:
+        if not self._subscribed:
+            return None
+        entry = self._local.get(email)
+        if entry is None:
+            return None
+        state, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._local[email]
+            return None
+        return state
+
+    def put_local(self, state: UserState) -> None:
+        if not self._subscribed or self.max_size <= 0:
+            return
+        self._local[state.email] = (state, time.monotonic() + self.local_ttl)
+        self._local.move_to_end(state.email)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    async def get(
+        self, redis: Redis, session: AsyncSession, email: str
+    ) -> UserState | None:
+        state = self.get_local(email)
+        if state is not None:
+            return state
+
+        with observe(REDIS_COMMAND_SECONDS, "user_state_get"):
+            cached = await redis.get(USER_STATE_KEY % email)
+        if cached is not None:
+            state = UserState.model_validate_json(cached)
+        else:
+            state = await crud.get_user_state(session=session, email=email)
+            if not state:
+                return None
+            with observe(REDIS_COMMAND_SECONDS, "user_state_set"):
+                stored = await self._fill(redis, email, state)
+            if not stored:
+                return state
+        self.put_local(state)
+        return state
+
+    async def _fill(self, redis: Redis | Pipeline, email: str, state: UserState):
+        """В пайплайне только ставит вызов в очередь."""
+        return await _fill_script(
+            keys=[USER_STATE_KEY % email, USER_STATE_TOMBSTONE_KEY % email],
+            args=[state.model_dump_json(), self.redis_ttl],
+            client=redis,
+        )
+
+    async def store_many(self, redis: Redis, states: list[UserState]) -> None:
+        async with redis.pipeline(transaction=False) as pipe:
+            for state in states:
+                await self._fill(pipe, state.email, state)
+            with observe(REDIS_COMMAND_SECONDS, "user_state_set"):
+                stored = await pipe.execute()
+        for state, ok in zip(states, stored):
+            if ok:
+                self.put_local(state)
+
+    async def invalidate(self, redis: Redis, email: str) -> None:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.set(
+                USER_STATE_TOMBSTONE_KEY % email,
+                1,
+                px=int((self.tombstone_ttl + self.replica_staleness) * 1000),
+            )
+            pipe.delete(USER_STATE_KEY % email)
+            pipe.publish(USER_STATE_CHANNEL, email)
+            await pipe.execute()
+        self._local.pop(email, None)
+
+    def handle_event(self, email: str) -> None:
+        self._local.pop(email, None)
+
+    async def on_connect(self, redis: Redis) -> None:
+        self._local.clear()
+        self._subscribed = True
+
+    def on_disconnect(self) -> None:
+        self._subscribed = False
+        self._local.clear()
+
+
+user_state_cache = UserStateCache(
+    local_ttl=settings.security.user_cache.local_ttl_seconds,
+    redis_ttl=settings.security.user_cache.redis_ttl_seconds,
+    max_size=settings.security.user_cache.max_size,
+    tombstone_ttl=settings.security.user_cache.tombstone_seconds,
+    replica_staleness=settings.postgres.replica_staleness_seconds,
+)
+event_bus.subscribe(USER_STATE_CHANNEL, user_state_cache.handle_event)
+event_bus.on_connect(user_state_cache.on_connect)
+event_bus.on_disconnect(user_state_cache.on_disconnect)
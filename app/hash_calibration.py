@@ -0,0 +1,102 @@
+import argparse
+import logging
+import time
+
+from app.core.hashing import HashParams, hash_password
+
+"""Подбор стоимости хеширования паролей под целевую задержку.
+
+    python -m app.hash_calibration --scheme bcrypt --target-ms 250
+
+Стоимость растет, пока среднее время одного хеша на этой машине не
+превысит target; выводится последний уложившийся вариант в виде
+переменных окружения для settings.security.password_hash. Запускайте на
+том же железе и с той же нагрузкой на CPU, что и у сервиса.
+"""
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+ENV_PREFIX = "ENV_SECURITY__PASSWORD_HASH__"
+PASSWORD = "calibration-password"
+
+
+def measure(params: HashParams, samples: int) -> float:
+    started = time.perf_counter()
+    for _ in range(samples):
+        hash_password(PASSWORD, params)
+    return (time.perf_counter() - started) / samples * 1000
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> HashParams:
+    best = HashParams(scheme="bcrypt", bcrypt_rounds=4)
+    for rounds in range(4, 32):
+        params = HashParams(scheme="bcrypt", bcrypt_rounds=rounds)
+        elapsed = measure(params, samples)
+        logger.info("bcrypt rounds=%d: %.1f ms" % (rounds, elapsed))
+        if elapsed > target_ms:
+            break
+        best = params
+    return best
+
+
+def calibrate_argon2id(
+    target_ms: float, samples: int, memory_cost: int, parallelism: int
+) -> HashParams:
+    """Память и параллелизм фиксированы, подбирается число проходов."""
+    best = HashParams(
+        scheme="argon2id",
+        argon2_time_cost=1,
+        argon2_memory_cost=memory_cost,
+        argon2_parallelism=parallelism,
+    )
+    for time_cost in range(1, 64):
+        params = HashParams(
+            scheme="argon2id",
+            argon2_time_cost=time_cost,
+            argon2_memory_cost=memory_cost,
+            argon2_parallelism=parallelism,
+        )
+        elapsed = measure(params, samples)
+        logger.info("argon2id time_cost=%d: %.1f ms" % (time_cost, elapsed))
+        if elapsed > target_ms:
+            if time_cost == 1:
+                logger.warning(
+                    "Even time_cost=1 exceeds the target, lower --memory-cost"
+                )
+            break
+        best = params
+    return best
+
+
+def main() -> None:
+    defaults = HashParams()
+    parser = argparse.ArgumentParser(description="Calibrate password hashing cost")
+    parser.add_argument("--scheme", choices=("bcrypt", "argon2id"), default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument(
+        "--memory-cost", type=int, default=defaults.argon2_memory_cost, help="KiB"
+    )
+    parser.add_argument("--parallelism", type=int, default=defaults.argon2_parallelism)
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        params = calibrate_bcrypt(args.target_ms, args.samples)
+        settings_env = {"SCHEME": "bcrypt", "BCRYPT_ROUNDS": params.bcrypt_rounds}
+    else:
+        params = calibrate_argon2id(
+            args.target_ms, args.samples, args.memory_cost, args.parallelism
+        )
+        settings_env = {
+            "SCHEME": "argon2id",
+            "ARGON2_TIME_COST": params.argon2_time_cost,
+            "ARGON2_MEMORY_COST": params.argon2_memory_cost,
+            "ARGON2_PARALLELISM": params.argon2_parallelism,
+        }
+    for name, value in settings_env.items():
+        print("%s%s=%s" % (ENV_PREFIX, name, value))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import asyncio
+import logging
+
+from app.database.redis_db import redis_helper
+from app.utils.mail_dispatcher import create_mail_dispatcher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    logger.info("Starting mail dispatcher")
+    async with redis_helper.client as redis:
+        await create_mail_dispatcher().run(redis)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,28 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 
 from app.api import api_router
+from app.api.deps import is_admin_token
+from app.api.routes.well_known import router as well_known_router
 from app.core.config import settings
+from app.core.executor import ExecutorBusy, crypto_executor
+from app.core.keys import key_ring
+from app.core.metrics import (
+    cleanup_dead_processes,
+    render_metrics,
+    sample_pools_forever,
+)
+from app.core.profiler import ProfilerMiddleware, profiler_manager
+from app.core.timing import ServerTimingMiddleware
+from app.database.db import db_helper
+from app.database.events import event_bus
+from app.database.redis_db import redis_helper
 
 
 logging.basicConfig(
@@ -20,8 +37,40 @@ def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cleanup_dead_processes()
+    key_ring.load()
+    await asyncio.gather(
+        db_helper.warm_up(settings.postgres.min_connections),
+        redis_helper.warm_up(settings.redis.min_connections),
+        crypto_executor.warm_up(),
+    )
+    event_bus.start()
+    pool_sampler = asyncio.create_task(
+        sample_pools_forever(db_helper.engine.pool, redis_helper.pool)
+    )
+    replica_monitor = (
+        asyncio.create_task(db_helper.monitor_replicas_forever())
+        if db_helper.replicas
+        else None
+    )
+    logger.info("Startup complete, connection pools warmed up")
+    yield
+    # к этому моменту uvicorn уже закрыл listener и дождался начатых
+    # запросов (не дольше --timeout-graceful-shutdown), поэтому пулы
+    # можно закрывать сразу
+    pool_sampler.cancel()
+    if replica_monitor is not None:
+        replica_monitor.cancel()
+    await event_bus.stop()
+    await asyncio.gather(db_helper.dispose(), redis_helper.close())
+    await asyncio.to_thread(crypto_executor.shutdown)
+
+
 app = FastAPI(
     title=settings.project_name,
+    lifespan=lifespan,
     generate_unique_id_function=custom_generate_unique_id,
 )
 
@@ -35,5 +84,29 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+if settings.debug.server_timing:
+    app.add_middleware(ServerTimingMiddleware)
+
+if settings.debug.profiler_token:
+    app.add_middleware(
+        ProfilerMiddleware, manager=profiler_manager, is_admin=is_admin_token
+    )
+
 
 app.include_router(api_router, prefix=settings.api_v1_str)
+app.include_router(well_known_router)
+
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy(request: Request, exc: ExecutorBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": str(settings.security.admission.retry_after_seconds)},
+    )
+
+
+@app.get("/metrics", tags=["metrics"], include_in_schema=False)
+def metrics() -> Response:
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
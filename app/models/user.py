@@ -1,7 +1,7 @@
 import uuid
 from enum import Enum
 
-from sqlalchemy import String
+from sqlalchemy import Index, String, func
 from sqlalchemy.dialects.postgresql import BYTEA, UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -20,8 +20,19 @@ class User(Base):
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
-    email: Mapped[str] = mapped_column(String(70), unique=True)
+    email: Mapped[str] = mapped_column(String(70))
     password: Mapped[bytes] = mapped_column(BYTEA)
     role: Mapped[UserRole] = mapped_column(default=UserRole.user)
     is_active: Mapped[bool] = mapped_column(default=True)
     is_verified: Mapped[bool] = mapped_column(default=False)
+
+    __table_args__ = (
+        # Уникальность без учета регистра; INCLUDE позволяет отвечать на
+        # поиск состояния пользователя по email сканом только индекса.
+        Index(
+            "ix_users_email_lower",
+            func.lower(email),
+            unique=True,
+            postgresql_include=["id", "email", "role", "is_active", "is_verified"],
+        ),
+    )
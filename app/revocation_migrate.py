@@ -0,0 +1,101 @@
+"""Перенос отзывов из ключей blacklist:<jti> в компактное хранилище.
+
+    python -m app.revocation_migrate [--dry-run]
+
+exp отозванного токена по старому ключу не восстановить, поэтому jti
+переносятся не в бакеты по exp, а в шарды <prefix>:legacy:<шард>, которые
+истекают вместе с самым долгим из перенесенных ключей; старые ключи
+удаляются. Порядок: выкатить версию с legacy_fallback (она уже пишет
+только в новый формат), запустить скрипт, а после напечатанного времени
+выключить ENV_SECURITY__REVOCATION_STORE__LEGACY_FALLBACK. Повторный
+запуск безопасен.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.database.blacklist import (
+    BLACKLIST_KEY,
+    LEGACY_BUCKET,
+    jti_bytes,
+    revocation_store,
+)
+from app.database.redis_db import redis_helper
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+async def migrate_batch(
+    redis: Redis, keys: list[str], expires: dict[str, int], dry_run: bool
+) -> int:
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+
+    now = int(time.time())
+    prefix_len = len(BLACKLIST_KEY % "")
+    moved = 0
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, ttl in zip(keys, ttls):
+            if ttl == -2:
+                continue
+            if ttl == -1:
+                ttl = settings.security.jwt.refresh_token_expire_days * 24 * 60 * 60
+            raw = jti_bytes(key[prefix_len:])
+            shard_key = revocation_store.key(raw, LEGACY_BUCKET)
+            # в legacy-шарды пишет только этот скрипт, поэтому срок
+            # достаточно только увеличивать
+            expires[shard_key] = max(expires.get(shard_key, 0), now + ttl)
+            pipe.hset(shard_key, raw, 1)
+            pipe.expireat(shard_key, expires[shard_key])
+            pipe.unlink(key)
+            moved += 1
+        if not dry_run:
+            await pipe.execute()
+    return moved
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    redis = redis_helper.client
+    expires: dict[str, int] = {}
+    moved = 0
+    keys = []
+    try:
+        async for key in redis.scan_iter(match=BLACKLIST_KEY % "*", count=1000):
+            keys.append(key)
+            if len(keys) >= BATCH_SIZE:
+                moved += await migrate_batch(redis, keys, expires, args.dry_run)
+                keys = []
+                logger.info("Migrated %d keys" % moved)
+        if keys:
+            moved += await migrate_batch(redis, keys, expires, args.dry_run)
+    finally:
+        await redis_helper.close()
+
+    logger.info(
+        "%s %d keys into %d legacy shards"
+        % ("Would migrate" if args.dry_run else "Migrated", moved, len(expires))
+    )
+    if expires:
+        until = datetime.fromtimestamp(max(expires.values()), timezone.utc)
+        logger.info("Legacy fallback can be disabled after %s" % until.isoformat())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 import uuid
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from app.models.user import UserRole
 
 
@@ -21,6 +21,16 @@ class UserPublic(UserBase):
     id: uuid.UUID
 
 
+class UserState(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    email: str
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -29,3 +39,24 @@ class Token(BaseModel):
 
 class RefreshToken(BaseModel):
     refresh_token: str
+
+
+class IntrospectionRequest(BaseModel):
+    tokens: list[str] = Field(min_length=1)
+
+
+class IntrospectionResult(BaseModel):
+    active: bool
+    sub: str | None = None
+    username: str | None = None
+    user_id: uuid.UUID | None = None
+    role: UserRole | None = None
+    is_verified: bool | None = None
+    token_type: str | None = None
+    jti: str | None = None
+    iat: int | None = None
+    exp: int | None = None
+
+
+class IntrospectionResponse(BaseModel):
+    results: list[IntrospectionResult]
@@ -1,52 +1,52 @@
+import json
 from datetime import datetime
-from email.message import EmailMessage
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from pathlib import Path
 from typing import Any
 
-import aiosmtplib
-from jinja2 import Template
+from redis.asyncio import Redis
 
 from app.core.config import settings
 
-
-def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent.parent / "email-templates" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
-    return html_content
-
-
-async def send_verify_token(to_email: str, token: str):
+"""Постановка писем в очередь Redis. Отправкой занимается отдельный
+процесс app.mail_worker (см. app.utils.mail_dispatcher), поэтому API не
+импортирует ни SMTP-клиент, ни шаблонизатор."""
+
+MAIL_QUEUE_KEY = "mail:queue"
+MAIL_PROCESSING_KEY = "mail:processing:%s"
+MAIL_RETRY_KEY = "mail:retry"
+MAIL_DEAD_KEY = "mail:dead"
+
+
+async def enqueue_email(
+    redis: Redis,
+    *,
+    to_email: str,
+    subject: str,
+    template_name: str,
+    context: dict[str, Any],
+    locale: str | None = None,
+) -> None:
+    job = {
+        "to": to_email,
+        "subject": subject,
+        "template": template_name,
+        "context": context,
+        "locale": locale or settings.smtp.default_locale,
+        "attempt": 0,
+    }
+    await redis.lpush(MAIL_QUEUE_KEY, json.dumps(job))
+
+
+async def send_verify_token(redis: Redis, to_email: str, token: str):
     confirmation_link = (
         f"{settings.frontend_host}{settings.api_v1_str}/auth/verify/?token={token}"
     )
-    message = MIMEMultipart()
-    message["From"] = settings.smtp.username
-    message["To"] = to_email
-    message["Subject"] = "Подтверждение регистрации"
-
-    message.attach(
-        MIMEText(
-            render_email_template(
-                template_name="verify-email.html",
-                context={
-                    "confirmation_link": confirmation_link,
-                    "year": datetime.now().year,
-                },
-            ),
-            "html",
-            "utf-8",
-        )
-    )
-
-    await aiosmtplib.send(
-        message,
-        hostname=settings.smtp.host,
-        port=settings.smtp.port,
-        username=settings.smtp.username,
-        password=settings.smtp.password,
-        use_tls=True,
+    await enqueue_email(
+        redis,
+        to_email=to_email,
+        subject="Подтверждение регистрации",
+        template_name="verify-email.html",
+        context={
+            "confirmation_link": confirmation_link,
+            "year": datetime.now().year,
+        },
     )
@@ -0,0 +1,98 @@
+import base64
+import uuid
+from email.policy import SMTP
+from email.message import EmailMessage
+from email.utils import formatdate
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    Template,
+    select_autoescape,
+)
+
+from app.core.config import settings
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "email-templates"
+
+
+class TemplateRegistry:
+    """Все шаблоны из email-templates, скомпилированные один раз.
+
+    Локализованные варианты лежат в подкаталогах по коду языка
+    (email-templates/en/verify-email.html) и подменяют шаблон по умолчанию.
+    """
+
+    def __init__(self, directory: Path, bytecode_cache_dir: Path | None) -> None:
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            bytecode_cache=FileSystemBytecodeCache(
+                str(bytecode_cache_dir) if bytecode_cache_dir else None
+            ),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=False,
+            cache_size=-1,
+        )
+        self._templates: dict[str, Template] = {}
+
+    def load(self) -> None:
+        self._templates = {
+            name: self.env.get_template(name) for name in self.env.list_templates()
+        }
+
+    def get(self, name: str, locale: str | None = None) -> Template:
+        if not self._templates:
+            self.load()
+        if locale is not None and "%s/%s" % (locale, name) in self._templates:
+            return self._templates["%s/%s" % (locale, name)]
+        return self._templates[name]
+
+    def render(
+        self, name: str, context: dict[str, Any], locale: str | None = None
+    ) -> str:
+        return self.get(name, locale).render(context)
+
+
+class MessageSkeleton:
+    """Заранее сериализованные неизменные заголовки письма: при отправке
+    остается дописать получателя, дату, Message-ID и тело."""
+
+    def __init__(self, sender: str, subject: str) -> None:
+        self.sender = sender
+        message = EmailMessage(policy=SMTP)
+        message["From"] = sender
+        message["Subject"] = subject
+        message["MIME-Version"] = "1.0"
+        message["Content-Type"] = 'text/html; charset="utf-8"'
+        message["Content-Transfer-Encoding"] = "base64"
+        self._head = message.as_bytes().rstrip(b"\r\n") + b"\r\n"
+        self._domain = sender.rpartition("@")[2] or "localhost"
+
+    def build(self, to_email: str, html: str) -> bytes:
+        body = base64.encodebytes(html.encode()).replace(b"\n", b"\r\n")
+        return b"".join(
+            (
+                self._head,
+                b"To: %s\r\n" % to_email.encode(),
+                b"Date: %s\r\n" % formatdate(localtime=True).encode(),
+                b"Message-ID: <%s@%s>\r\n"
+                % (uuid.uuid4().hex.encode(), self._domain.encode()),
+                b"\r\n",
+                body,
+            )
+        )
+
+
+@lru_cache(maxsize=64)
+def message_skeleton(subject: str) -> MessageSkeleton:
+    return MessageSkeleton(sender=settings.smtp.username, subject=subject)
+
+
+email_templates = TemplateRegistry(
+    directory=TEMPLATES_DIR,
+    bytecode_cache_dir=settings.smtp.template_cache_dir,
+)
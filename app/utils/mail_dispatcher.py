@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import socket
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import aiosmtplib
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.utils.email_helpers import (
+    MAIL_DEAD_KEY,
+    MAIL_PROCESSING_KEY,
+    MAIL_QUEUE_KEY,
+    MAIL_RETRY_KEY,
+)
+from app.utils.email_templates import email_templates, message_skeleton
+
+logger = logging.getLogger(__name__)
+
+# KEYS: MAIL_RETRY_KEY, MAIL_QUEUE_KEY; ARGV: текущее время
+_PROMOTE_RETRIES_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1], 'LIMIT', 0, 1000)
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('RPUSH', KEYS[2], unpack(due))
+end
+return #due
+"""
+
+
+def render_email_template(
+    *, template_name: str, context: dict[str, Any], locale: str | None = None
+) -> str:
+    return email_templates.render(template_name, context, locale)
+
+
+def build_message(job: dict) -> bytes:
+    html_content = render_email_template(
+        template_name=job["template"],
+        context=job["context"],
+        locale=job.get("locale"),
+    )
+    return message_skeleton(job["subject"]).build(job["to"], html_content)
+
+
+def is_permanent(error: Exception) -> bool:
+    """Отказ 5xx по конкретному письму: адресат или содержимое. Повтор его
+    не исправит. Отказы в авторизации и отправителе не сюда - они
+    касаются всех писем и чинятся настройкой, а не выбрасыванием писем."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(
+            is_permanent(refused) for refused in error.recipients
+        )
+    if isinstance(error, (aiosmtplib.SMTPRecipientRefused, aiosmtplib.SMTPDataError)):
+        return 500 <= error.code < 600
+    return False
+
+
+class SMTPPool:
+    """Пул долгоживущих SMTP-сессий: TLS и авторизация выполняются один
+    раз на соединение, а не на каждое письмо."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        use_tls: bool,
+        size: int,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._idle: asyncio.LifoQueue[aiosmtplib.SMTP] = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            use_tls=self.use_tls,
+        )
+        await smtp.connect()
+        return smtp
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        async with self._slots:
+            smtp = None
+            while smtp is None and not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate.is_connected:
+                    smtp = candidate
+            if smtp is None:
+                smtp = await self._connect()
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            self._idle.put_nowait(smtp)
+
+    async def send(self, sender: str, recipient: str, message: bytes) -> None:
+        async with self.connection() as smtp:
+            try:
+                await smtp.sendmail(sender, [recipient], message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # сервер закрыл простаивавшее соединение
+                await smtp.connect()
+                await smtp.sendmail(sender, [recipient], message)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+
+class MailDispatcher:
+    """Отправка писем из очереди в Redis.
+
+    Задания забираются пачками из MAIL_QUEUE_KEY в список обработки
+    воркера и удаляются из него только после отправки, поэтому падение
+    воркера не теряет письма: при старте незавершенные задания
+    возвращаются в очередь. Неудачные отправки повторяются с
+    экспоненциальной задержкой через MAIL_RETRY_KEY, после max_retries
+    попыток задание попадает в MAIL_DEAD_KEY. Туда же сразу, без повторов,
+    уходят задания, которые не разбираются, и письма, отвергнутые
+    сервером окончательно (5xx на адресата или содержимое).
+    """
+
+    def __init__(
+        self,
+        pool: SMTPPool,
+        batch_size: int,
+        max_retries: int,
+        retry_backoff: float,
+        consumer: str,
+    ) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.processing_key = MAIL_PROCESSING_KEY % consumer
+
+    async def recover(self, redis: Redis) -> None:
+        while await redis.lmove(self.processing_key, MAIL_QUEUE_KEY, "LEFT", "RIGHT"):
+            pass
+
+    async def promote_retries(self, redis: Redis) -> None:
+        await redis.eval(
+            _PROMOTE_RETRIES_LUA, 2, MAIL_RETRY_KEY, MAIL_QUEUE_KEY, time.time()
+        )
+
+    async def fetch_batch(self, redis: Redis, timeout: float) -> list[str]:
+        first = await redis.blmove(
+            MAIL_QUEUE_KEY, self.processing_key, timeout, "RIGHT", "LEFT"
+        )
+        if first is None:
+            return []
+        async with redis.pipeline(transaction=False) as pipe:
+            for _ in range(self.batch_size - 1):
+                pipe.lmove(MAIL_QUEUE_KEY, self.processing_key, "RIGHT", "LEFT")
+            rest = await pipe.execute()
+        return [first, *(raw for raw in rest if raw is not None)]
+
+    async def _deliver(self, redis: Redis, raw: str) -> bool:
+        try:
+            job = json.loads(raw)
+            recipient, attempt = job["to"], int(job["attempt"])
+        except (ValueError, KeyError, TypeError) as e:
+            # без разбора его не отправить и не отложить; если оставить
+            # в списке обработки, recover() будет возвращать его вечно
+            logger.error("Malformed email job moved to dead list: %s" % e)
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.lrem(self.processing_key, 1, raw)
+                pipe.lpush(MAIL_DEAD_KEY, raw)
+                await pipe.execute()
+            return False
+        try:
+            await self.pool.send(settings.smtp.username, recipient, build_message(job))
+        except Exception as e:
+            job["attempt"] = attempt + 1
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.lrem(self.processing_key, 1, raw)
+                if is_permanent(e) or job["attempt"] >= self.max_retries:
+                    logger.error("Email to %s dropped: %s" % (recipient, e))
+                    pipe.lpush(MAIL_DEAD_KEY, json.dumps(job))
+                else:
+                    delay = self.retry_backoff * 2 ** (job["attempt"] - 1)
+                    pipe.zadd(MAIL_RETRY_KEY, {json.dumps(job): time.time() + delay})
+                await pipe.execute()
+            return False
+        await redis.lrem(self.processing_key, 1, raw)
+        return True
+
+    async def process_batch(self, redis: Redis, timeout: float = 1.0) -> int:
+        await self.promote_retries(redis)
+        batch = await self.fetch_batch(redis, timeout)
+        if not batch:
+            return 0
+        results = await asyncio.gather(*(self._deliver(redis, raw) for raw in batch))
+        return sum(results)
+
+    async def run(self, redis: Redis) -> None:
+        email_templates.load()
+        await self.recover(redis)
+        try:
+            while True:
+                await self.process_batch(redis)
+        finally:
+            await self.pool.close()
+
+
+def create_mail_dispatcher() -> MailDispatcher:
+    return MailDispatcher(
+        pool=SMTPPool(
+            host=settings.smtp.host,
+            port=settings.smtp.port,
+            username=settings.smtp.username,
+            password=settings.smtp.password,
+            use_tls=settings.smtp.use_tls,
+            size=settings.smtp.pool_size,
+        ),
+        batch_size=settings.smtp.batch_size,
+        max_retries=settings.smtp.max_retries,
+        retry_backoff=settings.smtp.retry_backoff_seconds,
+        consumer=settings.smtp.consumer or socket.gethostname(),
+    )
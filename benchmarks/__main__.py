@@ -0,0 +1,65 @@
+"""Полный прогон бенчмарков с записью JSON для сравнения релизов.
+
+python -m benchmarks --output benchmarks/results/current.json
+python -m benchmarks --compare benchmarks/results/baseline.json
+python -m benchmarks --skip-load  # без Postgres и Redis
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks import load, micro
+from benchmarks.stats import compare
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--hash-iterations", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    results: dict = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "micro": await micro.run(args.iterations, args.hash_iterations),
+    }
+    if not args.skip_load:
+        results["load"] = await load.run(args.requests, args.concurrency, args.users)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print("\n".join(compare(baseline, results)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
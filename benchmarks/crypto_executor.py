@@ -0,0 +1,84 @@
+"""Задержка дешевого запроса во время шторма логинов.
+
+Пока N корутин проверяют bcrypt-пароли, отдельная корутина каждые 5 мс
+выполняет дешевую операцию (как /auth/refresh без bcrypt) и меряет,
+сколько она реально ждала event loop.
+
+    python -m benchmarks.crypto_executor --logins 20
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core import hashing
+from app.core.executor import CryptoExecutor, ExecutorBusy
+from benchmarks.stats import percentile
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def storm(
+    logins: int, executor: CryptoExecutor | None
+) -> tuple[list[float], int]:
+    hashed = hashing.hash_password("password", hashing.HashParams())
+    rejected = 0
+
+    async def login() -> None:
+        nonlocal rejected
+        if executor is None:
+            hashing.validate_password("password", hashed)
+        else:
+            try:
+                await executor.run(hashing.validate_password, "password", hashed)
+            except ExecutorBusy:
+                rejected += 1
+        await asyncio.sleep(0)
+
+    stop = asyncio.Event()
+    samples: list[float] = []
+    probe_task = asyncio.create_task(probe(stop, samples))
+    await asyncio.sleep(PROBE_INTERVAL * 4)
+    await asyncio.gather(*(login() for _ in range(logins)))
+    stop.set()
+    await probe_task
+    return samples, rejected
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=32)
+    args = parser.parse_args()
+
+    runs = {
+        "inline": None,
+        "thread": CryptoExecutor("thread", args.pool_size, args.queue_size),
+        "process": CryptoExecutor("process", args.pool_size, args.queue_size),
+    }
+    for name, executor in runs.items():
+        samples, rejected = await storm(args.logins, executor)
+        if executor is not None:
+            executor.shutdown()
+        print(
+            "%-8s probe lag ms: p50=%.1f p99=%.1f max=%.1f, rejected %d"
+            % (
+                name,
+                percentile(samples, 50),
+                percentile(samples, 99),
+                max(samples),
+                rejected,
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Бюджет времени импорта app.main, замеренный через -X importtime.
+
+    python -m benchmarks.import_time --budget-ms 1000
+
+Импорт повторяется в отдельных процессах, берется лучший прогон (первый
+обычно упирается в холодный дисковый кэш). Скрипт завершается с кодом 1,
+если app.main импортируется дольше бюджета или тянет модули, которые API
+при старте не нужны: SMTP-клиент и шаблоны (нужны только mail_worker),
+alembic и драйвер asyncpg (engine создается при первом обращении).
+Подходит для запуска в CI.
+"""
+
+import argparse
+import subprocess
+import sys
+
+TARGET = "app.main"
+FORBIDDEN = ("aiosmtplib", "jinja2", "alembic", "asyncpg")
+
+
+def import_profile(module: str) -> dict[str, tuple[int, int]]:
+    """Возвращает {модуль: (self, cumulative)} в микросекундах."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    profiles = [import_profile(TARGET) for _ in range(args.runs)]
+    best = min(profiles, key=lambda profile: profile[TARGET][1])
+    total_ms = best[TARGET][1] / 1000
+
+    print("%s: %.1f ms (budget %.0f ms)" % (TARGET, total_ms, args.budget_ms))
+    print("slowest modules by self time:")
+    heaviest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in heaviest[: args.top]:
+        print("  %8.1f ms %8.1f ms  %s" % (self_us / 1000, cumulative_us / 1000, name))
+
+    failed = False
+    forbidden = [name for name in FORBIDDEN if name in best]
+    if forbidden:
+        print("FAIL: %s imports %s" % (TARGET, ", ".join(forbidden)))
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: import time is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
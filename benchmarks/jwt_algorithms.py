@@ -0,0 +1,48 @@
+"""Подпись и проверка JWT разными алгоритмами: RS256 (RSA 2048), ES256
+(P-256) и EdDSA (Ed25519). Ключи разобраны заранее, как в KeyRing.
+
+    python -m benchmarks.jwt_algorithms --seconds 2
+"""
+
+import argparse
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from benchmarks.stats import throughput
+
+PAYLOAD = {"type": "access", "sub": "user@example.com", "user_id": "1"}
+
+
+def generate_keys() -> dict:
+    return {
+        "RS256": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "ES256": ec.generate_private_key(ec.SECP256R1()),
+        "EdDSA": ed25519.Ed25519PrivateKey.generate(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    for algorithm, private_key in generate_keys().items():
+        public_key = private_key.public_key()
+        token = jwt.encode(PAYLOAD, private_key, algorithm=algorithm)
+        sign = throughput(
+            lambda: jwt.encode(PAYLOAD, private_key, algorithm=algorithm),
+            args.seconds,
+        )
+        verify = throughput(
+            lambda: jwt.decode(token, public_key, algorithms=[algorithm]),
+            args.seconds,
+        )
+        print(
+            "%-6s sign=%8.0f ops/s verify=%8.0f ops/s token=%d bytes"
+            % (algorithm, sign, verify, len(token))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Пропускная способность подписи и проверки JWT: PEM-текст против
+заранее разобранных ключей cryptography.
+
+    python -m benchmarks.jwt_keys --seconds 2
+"""
+
+import argparse
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from benchmarks.stats import throughput
+
+PAYLOAD = {"type": "access", "sub": "user@example.com", "user_id": "1"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_key = private_key.public_key()
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    public_pem = public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+
+    keys = {"pem": (private_pem, public_pem), "parsed": (private_key, public_key)}
+    for name, (signing_key, verification_key) in keys.items():
+        token = jwt.encode(PAYLOAD, signing_key, algorithm="RS256")
+        sign = throughput(
+            lambda: jwt.encode(PAYLOAD, signing_key, algorithm="RS256"),
+            args.seconds,
+        )
+        verify = throughput(
+            lambda: jwt.decode(token, verification_key, algorithms=["RS256"]),
+            args.seconds,
+        )
+        print("%-7s sign=%8.0f ops/s verify=%8.0f ops/s" % (name, sign, verify))
+
+
+if __name__ == "__main__":
+    main()
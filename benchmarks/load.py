@@ -0,0 +1,180 @@
+"""Нагрузочный прогон app.main.app через ASGI-транспорт httpx в одном
+процессе, без сети и uvicorn.
+
+Нужны локальные Postgres и Redis из настроек (например, из
+docker-compose) с примененными миграциями. Прогон создает пользователей
+bench-*@bench.example.com и удаляет их в конце. Ограничение частоты
+входа на время прогона отключается: все запросы идут с одного адреса.
+
+    python -m benchmarks.load --requests 500 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable
+
+import httpx
+from sqlalchemy import delete, update
+
+from app.core.config import settings
+from app.core.security import TokenTypes, create_token_by_type
+from app.database import crud
+from app.database.db import db_helper
+from app.database.rate_limit import login_throttle
+from app.main import app
+from app.models import User
+from app.schemas import UserCreate, UserState
+from benchmarks.stats import summarize
+
+PASSWORD = "benchmark-password"
+EMAIL_DOMAIN = "bench.example.com"
+AUTH_PREFIX = settings.api_v1_str + "/auth"
+
+
+async def create_users(count: int) -> list[UserState]:
+    users = []
+    async for session in db_helper.get_session():
+        for _ in range(count):
+            user_in = UserCreate(
+                email="bench-%s@%s" % (uuid.uuid4().hex[:12], EMAIL_DOMAIN),
+                password=PASSWORD,
+            )
+            users.append(await crud.create_user(session=session, user_create=user_in))
+    return users
+
+
+async def delete_users() -> None:
+    async for session in db_helper.get_session():
+        await session.execute(
+            delete(User).where(User.email.like("bench-%%@%s" % EMAIL_DOMAIN))
+        )
+        await session.commit()
+
+
+async def reset_verification() -> None:
+    async for session in db_helper.get_session():
+        await session.execute(
+            update(User)
+            .where(User.email.like("bench-%%@%s" % EMAIL_DOMAIN))
+            .values(is_verified=False)
+        )
+        await session.commit()
+
+
+def token_pair(user: UserState) -> tuple[str, str]:
+    refresh_jti = str(uuid.uuid4())
+    return (
+        create_token_by_type(TokenTypes.ACCESS)(user),
+        create_token_by_type(TokenTypes.REFRESH)(
+            user, jti=refresh_jti, family=refresh_jti
+        ),
+    )
+
+
+async def run_scenario(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    expected: set[int],
+    requests: int,
+    concurrency: int,
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in indexes:
+            started = time.perf_counter()
+            response = await send(index)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code not in expected:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(requests: int, concurrency: int, users_count: int) -> dict:
+    login_throttle.enabled = False
+    users = await create_users(users_count)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    try:
+        async with (
+            app.router.lifespan_context(app),
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client,
+        ):
+
+            async def login(index: int) -> httpx.Response:
+                user = users[index % len(users)]
+                return await client.post(
+                    AUTH_PREFIX + "/login",
+                    data={"username": user.email, "password": PASSWORD},
+                )
+
+            refresh_tokens = [
+                token_pair(users[index % len(users)])[1] for index in range(requests)
+            ]
+
+            async def refresh(index: int) -> httpx.Response:
+                return await client.post(
+                    AUTH_PREFIX + "/refresh",
+                    json={"refresh_token": refresh_tokens[index]},
+                )
+
+            logout_pairs = [
+                token_pair(users[index % len(users)]) for index in range(requests)
+            ]
+
+            async def logout(index: int) -> httpx.Response:
+                access_token, refresh_token = logout_pairs[index]
+                return await client.post(
+                    AUTH_PREFIX + "/logout",
+                    json={"refresh_token": refresh_token},
+                    headers={"Authorization": "Bearer %s" % access_token},
+                )
+
+            verify_tokens = [
+                create_token_by_type(TokenTypes.VERIFY)(users[index % len(users)])
+                for index in range(requests)
+            ]
+
+            async def verify(index: int) -> httpx.Response:
+                return await client.get(
+                    AUTH_PREFIX + "/verify", params={"token": verify_tokens[index]}
+                )
+
+            # после первой проверки пользователь уже подтвержден (400),
+            # но путь до UPDATE тот же
+            await reset_verification()
+            scenarios = {
+                "login": (login, {200}),
+                "refresh": (refresh, {200}),
+                "logout": (logout, {204}),
+                "verify": (verify, {200, 400}),
+            }
+            for name, (send, expected) in scenarios.items():
+                results[name] = await run_scenario(
+                    send, expected, requests, concurrency
+                )
+    finally:
+        await delete_users()
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+    results = await run(args.requests, args.concurrency, args.users)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
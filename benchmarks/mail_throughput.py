@@ -0,0 +1,84 @@
+"""Пропускная способность отправки писем на локальный aiosmtpd.
+
+Сравнивает aiosmtplib.send (новое соединение на письмо) с SMTPPool
+(долгоживущие сессии). Нужен пакет aiosmtpd.
+
+    python -m benchmarks.mail_throughput --messages 500 --pool-size 4
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.utils.mail_dispatcher import SMTPPool, build_message
+
+HOST = "127.0.0.1"
+SENDER = "noreply@example.com"
+RECIPIENT = "user@example.com"
+
+
+class Sink:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+async def measure(name: str, messages: int, send) -> None:
+    job = {
+        "to": RECIPIENT,
+        "subject": "Benchmark",
+        "template": "verify-email.html",
+        "context": {"confirmation_link": "http://localhost/verify", "year": 2025},
+    }
+    started = time.perf_counter()
+    await asyncio.gather(*(send(build_message(job)) for _ in range(messages)))
+    elapsed = time.perf_counter() - started
+    print("%-12s %6.0f msg/s" % (name, messages / elapsed))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    controller = Controller(Sink(), hostname=HOST, port=args.port)
+    controller.start()
+    try:
+        slots = asyncio.Semaphore(args.pool_size)
+
+        async def send_per_message(message: bytes) -> None:
+            async with slots:
+                await aiosmtplib.send(
+                    message,
+                    sender=SENDER,
+                    recipients=[RECIPIENT],
+                    hostname=HOST,
+                    port=args.port,
+                    start_tls=False,
+                )
+
+        pool = SMTPPool(
+            host=HOST,
+            port=args.port,
+            username="",
+            password="",
+            use_tls=False,
+            size=args.pool_size,
+        )
+        await measure("per-message", args.messages, send_per_message)
+        await measure(
+            "pooled",
+            args.messages,
+            lambda message: pool.send(SENDER, RECIPIENT, message),
+        )
+        await pool.close()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""Микробенчмарки горячих путей: хэширование паролей и JWT.
+
+python -m benchmarks.micro --iterations 200
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+
+from app.core.security import (
+    TokenTypes,
+    create_token_by_type,
+    decode_jwt,
+    encode_jwt,
+    hash_password,
+    validate_password,
+)
+from app.models.user import UserRole
+from app.schemas import UserState
+from benchmarks.stats import measure, measure_async
+
+PASSWORD = "benchmark-password"
+
+
+async def run(iterations: int, hash_iterations: int) -> dict:
+    user = UserState(
+        id=uuid.uuid4(),
+        email="bench@example.com",
+        role=UserRole.user,
+        is_active=True,
+        is_verified=True,
+    )
+    payload = {"type": TokenTypes.ACCESS, "sub": user.email, "user_id": str(user.id)}
+    token = encode_jwt(payload)
+    hashed = await hash_password(PASSWORD)
+
+    return {
+        "hash_password": await measure_async(
+            lambda: hash_password(PASSWORD), hash_iterations
+        ),
+        "validate_password": await measure_async(
+            lambda: validate_password(PASSWORD, hashed), hash_iterations
+        ),
+        "encode_jwt": measure(lambda: encode_jwt(payload), iterations),
+        "decode_jwt": measure(lambda: decode_jwt(token), iterations),
+        "create_token_by_type": measure(
+            lambda: create_token_by_type(TokenTypes.REFRESH)(user), iterations
+        ),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--hash-iterations", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(await run(args.iterations, args.hash_iterations), indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
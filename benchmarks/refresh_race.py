@@ -0,0 +1,58 @@
+"""Параллельные refresh одним и тем же токеном против настоящего Redis.
+
+Ровно один запрос должен получить новую пару токенов, повторное
+предъявление старого токена - отозвать все семейство.
+
+    python -m benchmarks.refresh_race --parallel 50
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter
+
+from app.database.blacklist import RotationResult, rotate_refresh_token
+from app.database.redis_db import redis_helper
+
+TTL = 60
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parallel", type=int, default=50)
+    args = parser.parse_args()
+
+    redis = redis_helper.client
+    family = old_jti = str(uuid.uuid4())
+    exp = time.time() + TTL
+    new_jtis = [str(uuid.uuid4()) for _ in range(args.parallel)]
+    results = await asyncio.gather(
+        *(
+            rotate_refresh_token(redis, family, old_jti, exp, new_jti, TTL)
+            for new_jti in new_jtis
+        )
+    )
+    counts = Counter(result.name for result in results)
+    print("parallel refreshes: %s" % dict(counts))
+
+    winner = new_jtis[results.index(RotationResult.ROTATED)]
+    replay = await rotate_refresh_token(
+        redis, family, old_jti, exp, str(uuid.uuid4()), TTL
+    )
+    after_replay = await rotate_refresh_token(
+        redis, family, winner, exp, str(uuid.uuid4()), TTL
+    )
+    print("replay of old token: %s" % replay.name)
+    print("winner after replay: %s" % after_replay.name)
+
+    ok = (
+        counts[RotationResult.ROTATED.name] == 1
+        and after_replay == RotationResult.REVOKED
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
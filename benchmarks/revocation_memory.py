@@ -0,0 +1,128 @@
+"""Память Redis под отозванные jti: прежние ключи против хешей по бакетам.
+
+Пишет count отзывов с exp, равномерно разбросанным по сроку жизни
+refresh-токена, в каждом формате по очереди и меряет прирост
+used_memory. Нужен отдельный Redis: 10M ключей в прежнем формате
+занимают около гигабайта, а чужая нагрузка исказит замер.
+
+    python -m benchmarks.revocation_memory --counts 1000000 10000000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.database.blacklist import RevocationStore
+from app.database.redis_db import redis_helper
+
+LEGACY_KEY = "bench_blacklist:%s"
+PREFIX = "bench_revoked"
+BATCH_SIZE = 10_000
+
+
+async def used_memory(redis: Redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def cleanup(redis: Redis) -> None:
+    for pattern in (LEGACY_KEY % "*", "%s:*" % PREFIX):
+        keys = []
+        async for key in redis.scan_iter(match=pattern, count=10_000):
+            keys.append(key)
+            if len(keys) >= BATCH_SIZE:
+                await redis.unlink(*keys)
+                keys = []
+        if keys:
+            await redis.unlink(*keys)
+
+
+def revocations(count: int, lifetime: int):
+    now = time.time()
+    for _ in range(count):
+        yield str(uuid.uuid4()), now + random.uniform(0, lifetime)
+
+
+async def fill(redis: Redis, count: int, lifetime: int, store) -> None:
+    now = time.time()
+    pending = 0
+    pipe = redis.pipeline(transaction=False)
+    for jti, exp in revocations(count, lifetime):
+        if store is None:
+            pipe.set(LEGACY_KEY % jti, "revoked", ex=int(exp - now) + 1)
+        else:
+            store.queue_add(pipe, jti, exp)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            await pipe.execute()
+            pending = 0
+    await pipe.execute()
+
+
+async def measure(redis: Redis, count: int, lifetime: int, store) -> dict:
+    await cleanup(redis)
+    before = await used_memory(redis)
+    started = time.perf_counter()
+    await fill(redis, count, lifetime, store)
+    elapsed = time.perf_counter() - started
+    used = await used_memory(redis) - before
+    result = {
+        "bytes": used,
+        "bytes_per_jti": used / count,
+        "writes_per_s": count / elapsed,
+    }
+    if store is not None:
+        keys = [key async for key in redis.scan_iter(match="%s:*" % PREFIX)]
+        result["keys"] = len(keys)
+        result["encoding"] = await redis.object("encoding", keys[0])
+    await cleanup(redis)
+    return result
+
+
+async def main() -> None:
+    defaults = settings.security.revocation_store
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--counts", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--bucket-seconds", type=int, default=defaults.bucket_seconds)
+    parser.add_argument("--shards", type=int, default=defaults.shards)
+    args = parser.parse_args()
+
+    store = RevocationStore(
+        prefix=PREFIX,
+        bucket_seconds=args.bucket_seconds,
+        shards=args.shards,
+        legacy_fallback=False,
+    )
+    lifetime = settings.security.jwt.refresh_token_expire_days * 24 * 60 * 60
+    redis = redis_helper.client
+    try:
+        for count in args.counts:
+            for name, layout in (("legacy", None), ("compact", store)):
+                result = await measure(redis, count, lifetime, layout)
+                print(
+                    "%-8s %10d jti: %8.1f MiB, %5.1f B/jti, %7.0f writes/s%s"
+                    % (
+                        name,
+                        count,
+                        result["bytes"] / 2**20,
+                        result["bytes_per_jti"],
+                        result["writes_per_s"],
+                        (
+                            ", %d keys, %s" % (result["keys"], result["encoding"])
+                            if "keys" in result
+                            else ""
+                        ),
+                    )
+                )
+    finally:
+        await redis_helper.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+
+
+def percentile(samples: list[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def summarize(latencies_ms: list[float], elapsed: float, errors: int = 0) -> dict:
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughput": round(len(latencies_ms) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+    }
+
+
+def throughput(func: Callable[[], Any], seconds: float) -> float:
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        func()
+        calls += 1
+    return calls / (time.perf_counter() - started)
+
+
+def measure(func: Callable[[], Any], iterations: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def measure_async(func: Callable[[], Awaitable[Any]], iterations: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        await func()
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def compare(baseline: dict, current: dict, path: str = "") -> list[str]:
+    """Строки с изменением p99 и throughput относительно baseline."""
+    lines = []
+    for name, value in current.items():
+        base = baseline.get(name)
+        if not isinstance(value, dict) or not isinstance(base, dict):
+            continue
+        if "p99_ms" in value and "p99_ms" in base:
+            lines.append(
+                "%-40s p99 %8.3f -> %8.3f ms (%+.1f%%)  rps %8.1f -> %8.1f"
+                % (
+                    path + name,
+                    base["p99_ms"],
+                    value["p99_ms"],
+                    _delta(base["p99_ms"], value["p99_ms"]),
+                    base["throughput"],
+                    value["throughput"],
+                )
+            )
+        else:
+            lines.extend(compare(base, value, path + name + "."))
+    return lines
+
+
+def _delta(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
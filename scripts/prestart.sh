@@ -9,20 +9,32 @@ PRIVATE_KEY="app/core/certs/private_key.pem"
 PUBLIC_KEY="app/core/certs/public_key.pem"
 
 
+JWT_ALGORITHM=$(python -c "from app.core.config import settings; print(settings.security.jwt.algorithm)")
+
+
 if [ ! -f "$PRIVATE_KEY" ]; then
-    echo "Generating private key..."
-    openssl genrsa -out "$PRIVATE_KEY" 2048
+    echo "Generating $JWT_ALGORITHM private key..."
+    case "$JWT_ALGORITHM" in
+        RS256) openssl genpkey -algorithm RSA -pkeyopt rsa_keygen_bits:2048 -out "$PRIVATE_KEY" ;;
+        ES256) openssl genpkey -algorithm EC -pkeyopt ec_paramgen_curve:P-256 -out "$PRIVATE_KEY" ;;
+        EdDSA) openssl genpkey -algorithm ED25519 -out "$PRIVATE_KEY" ;;
+    esac
 else
     echo "Private key already exists."
 fi
 
 if [ ! -f "$PUBLIC_KEY" ]; then
     echo "Generating public key..."
-    openssl rsa -in "$PRIVATE_KEY" -outform PEM -pubout -out "$PUBLIC_KEY"
+    openssl pkey -in "$PRIVATE_KEY" -pubout -out "$PUBLIC_KEY"
 else
     echo "Public key already exists."
 fi
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 python -m app.backend_pre_start
 
 alembic upgrade head